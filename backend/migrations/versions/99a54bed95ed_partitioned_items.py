@@ -0,0 +1,82 @@
+"""Hash-partitioned copy of items by organization_id, kept in sync until scripts/partition_items.py swaps it in
+
+Revision ID: 99a54bed95ed
+Revises: ab2417d38125
+Create Date: 2026-10-18 18:36:14.520871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '99a54bed95ed'
+down_revision: Union[str, None] = 'ab2417d38125'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ITEM_PARTITIONS = 16
+
+# Indexes of models.Item, suffixed until the swap renames them; a unique index has to include the
+# partition key, so (organization_id, id) replaces the primary key on id
+PARTITIONED_INDEXES = {
+    'ix_items_organization_id_id': 'UNIQUE INDEX {name} ON items_partitioned (organization_id, id)',
+    'ix_items_id': 'INDEX {name} ON items_partitioned (id)',
+    'ix_items_organization_id_price': 'INDEX {name} ON items_partitioned (organization_id, price)',
+    'ix_items_organization_id_created_at': 'INDEX {name} ON items_partitioned (organization_id, created_at, id)',
+    'ix_items_organization_id_name': 'INDEX {name} ON items_partitioned (organization_id, name, id)',
+    'ix_items_name_trgm': 'INDEX {name} ON items_partitioned USING gin (name gin_trgm_ops)',
+    'ix_items_name_tsv': "INDEX {name} ON items_partitioned USING gin (to_tsvector('simple', name))",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Postgres only. items_partitioned shares the items_id_seq default, and every write on items is mirrored
+    # into it by a trigger while scripts/partition_items.py backfills the existing rows and swaps the tables
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE TABLE items_partitioned (LIKE items INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY HASH (organization_id)')
+    op.execute('ALTER TABLE items_partitioned ADD CONSTRAINT items_partitioned_organization_id_fkey '
+               'FOREIGN KEY (organization_id) REFERENCES organizations (id)')
+    for remainder in range(ITEM_PARTITIONS):
+        op.execute(f'CREATE TABLE items_p{remainder} PARTITION OF items_partitioned '
+                   f'FOR VALUES WITH (MODULUS {ITEM_PARTITIONS}, REMAINDER {remainder})')
+    for name, index in PARTITIONED_INDEXES.items():
+        op.execute('CREATE ' + index.format(name=f'{name}_partitioned'))
+
+    # Same tenant isolation as items (TENANT_ISOLATION=rls)
+    op.execute('GRANT SELECT, INSERT, UPDATE, DELETE ON items_partitioned TO app_tenant')
+    op.execute('ALTER TABLE items_partitioned ENABLE ROW LEVEL SECURITY')
+    op.execute("CREATE POLICY tenant_isolation ON items_partitioned TO app_tenant "
+               "USING (organization_id = current_setting('app.current_org')) "
+               "WITH CHECK (organization_id = current_setting('app.current_org'))")
+
+    op.execute("""
+        CREATE FUNCTION items_partitioned_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM items_partitioned WHERE id = OLD.id;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO items_partitioned SELECT NEW.*;
+            END IF;
+            RETURN NULL;
+        END $$
+    """)
+    op.execute('CREATE TRIGGER items_partitioned_sync AFTER INSERT OR UPDATE OR DELETE ON items '
+               'FOR EACH ROW EXECUTE FUNCTION items_partitioned_sync()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    swapped = op.get_bind().scalar(sa.text("SELECT EXISTS (SELECT FROM pg_partitioned_table WHERE partrelid = 'items'::regclass)"))
+    if swapped:
+        raise RuntimeError('items is already the partitioned table; swap items_unpartitioned back in by hand before downgrading')
+    op.execute('DROP TRIGGER IF EXISTS items_partitioned_sync ON items')
+    op.execute('DROP FUNCTION IF EXISTS items_partitioned_sync()')
+    op.execute('DROP TABLE IF EXISTS items_partitioned')
@@ -0,0 +1,43 @@
+"""Add user_effective_permissions
+
+Revision ID: a1c4e2f9b3d7
+Revises: 
+Create Date: 2026-10-18 09:12:41.318205
+
+Baseline: databases created by scripts/seed_reset_db.py before migrations were introduced.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c4e2f9b3d7'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'user_effective_permissions',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('permission_id', sa.Integer(), sa.ForeignKey('permissions.id', ondelete='CASCADE'), primary_key=True),
+    )
+    op.create_index('ix_user_effective_permissions_permission_id', 'user_effective_permissions', ['permission_id'])
+
+    # Backfill from the role assignments
+    op.execute(
+        "INSERT INTO user_effective_permissions (user_id, permission_id) "
+        "SELECT DISTINCT user_roles.user_id, role_permissions.permission_id "
+        "FROM user_roles JOIN role_permissions ON role_permissions.role_id = user_roles.role_id "
+        "WHERE user_roles.user_id IS NOT NULL AND role_permissions.permission_id IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_effective_permissions_permission_id', table_name='user_effective_permissions')
+    op.drop_table('user_effective_permissions')
@@ -0,0 +1,55 @@
+"""Row-level security policies on items and users for TENANT_ISOLATION=rls
+
+Revision ID: ab2417d38125
+Revises: f8c2d5b0e917
+Create Date: 2026-10-18 17:52:08.316940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ab2417d38125'
+down_revision: Union[str, None] = 'f8c2d5b0e917'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TENANT_TABLES = ('items', 'users')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Postgres only; the policies apply to the app_tenant role the API switches to per transaction,
+    # not to the tables' owner, so filter mode keeps working unchanged
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DO $$ BEGIN IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = 'app_tenant') THEN CREATE ROLE app_tenant NOLOGIN; END IF; END $$")
+    op.execute('GRANT app_tenant TO CURRENT_USER')
+    op.execute('GRANT USAGE ON SCHEMA public TO app_tenant')
+    op.execute('GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA public TO app_tenant')
+    op.execute('GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO app_tenant')
+    op.execute('ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT SELECT, INSERT, UPDATE, DELETE ON TABLES TO app_tenant')
+    op.execute('ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT USAGE, SELECT ON SEQUENCES TO app_tenant')
+    for table in TENANT_TABLES:
+        op.execute(f'ALTER TABLE {table} ENABLE ROW LEVEL SECURITY')
+        op.execute(f"CREATE POLICY tenant_isolation ON {table} TO app_tenant "
+                   f"USING (organization_id = current_setting('app.current_org')) "
+                   f"WITH CHECK (organization_id = current_setting('app.current_org'))")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The app_tenant role is cluster-wide and may be used by other databases, so it is left in place
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in TENANT_TABLES:
+        op.execute(f'DROP POLICY IF EXISTS tenant_isolation ON {table}')
+        op.execute(f'ALTER TABLE {table} DISABLE ROW LEVEL SECURITY')
+    op.execute('ALTER DEFAULT PRIVILEGES IN SCHEMA public REVOKE ALL ON SEQUENCES FROM app_tenant')
+    op.execute('ALTER DEFAULT PRIVILEGES IN SCHEMA public REVOKE ALL ON TABLES FROM app_tenant')
+    op.execute('REVOKE ALL ON ALL SEQUENCES IN SCHEMA public FROM app_tenant')
+    op.execute('REVOKE ALL ON ALL TABLES IN SCHEMA public FROM app_tenant')
+    op.execute('REVOKE USAGE ON SCHEMA public FROM app_tenant')
@@ -0,0 +1,55 @@
+"""Primary keys and reverse indexes on user_roles and role_permissions
+
+Revision ID: b7e93d0c51a2
+Revises: a1c4e2f9b3d7
+Create Date: 2026-10-18 10:03:27.904512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e93d0c51a2'
+down_revision: Union[str, None] = 'a1c4e2f9b3d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> (primary key columns, reverse index name)
+ASSOCIATION_TABLES = {
+    'user_roles': (['user_id', 'role_id'], 'ix_user_roles_role_id_user_id'),
+    'role_permissions': (['role_id', 'permission_id'], 'ix_role_permissions_permission_id_role_id'),
+}
+
+
+def dedupe(table: str, columns: list[str]) -> None:
+    """Drop rows with a NULL key and keep one row of each duplicated key."""
+    op.execute(f"DELETE FROM {table} WHERE {' OR '.join(f'{column} IS NULL' for column in columns)}")
+    if op.get_bind().dialect.name == 'postgresql':
+        matches = ' AND '.join(f'a.{column} = b.{column}' for column in columns)
+        op.execute(f"DELETE FROM {table} a USING {table} b WHERE a.ctid > b.ctid AND {matches}")
+    else:
+        op.execute(f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MIN(rowid) FROM {table} GROUP BY {', '.join(columns)})")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, (columns, reverse_index) in ASSOCIATION_TABLES.items():
+        dedupe(table, columns)
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, existing_type=sa.Integer(), nullable=False)
+            batch_op.create_primary_key(f'{table}_pkey', columns)
+            batch_op.create_index(reverse_index, list(reversed(columns)))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, (columns, reverse_index) in ASSOCIATION_TABLES.items():
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index(reverse_index)
+            batch_op.drop_constraint(f'{table}_pkey', type_='primary')
+            for column in columns:
+                batch_op.alter_column(column, existing_type=sa.Integer(), nullable=True)
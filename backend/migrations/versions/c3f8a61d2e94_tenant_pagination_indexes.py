@@ -0,0 +1,30 @@
+"""Tenant-scoped (organization_id, id) indexes for keyset pagination
+
+Revision ID: c3f8a61d2e94
+Revises: b7e93d0c51a2
+Create Date: 2026-10-18 11:26:05.117630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a61d2e94'
+down_revision: Union[str, None] = 'b7e93d0c51a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_items_organization_id_id', 'items', ['organization_id', 'id'])
+    op.create_index('ix_users_organization_id_id', 'users', ['organization_id', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_organization_id_id', table_name='users')
+    op.drop_index('ix_items_organization_id_id', table_name='items')
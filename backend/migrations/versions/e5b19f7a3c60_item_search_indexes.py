@@ -0,0 +1,37 @@
+"""Indexes for item search, filtering and sorting
+
+Revision ID: e5b19f7a3c60
+Revises: d2a7c4e81f53
+Create Date: 2026-10-18 15:20:12.684201
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b19f7a3c60'
+down_revision: Union[str, None] = 'd2a7c4e81f53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_items_organization_id_price', 'items', ['organization_id', 'price'])
+
+    # Name search indexes are Postgres only; other databases fall back to LIKE scans
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_items_name_trgm', 'items', ['name'], postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_items_name_tsv', 'items', [sa.text("to_tsvector('simple', name)")], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_items_name_tsv', table_name='items')
+        op.drop_index('ix_items_name_trgm', table_name='items')
+    op.drop_index('ix_items_organization_id_price', table_name='items')
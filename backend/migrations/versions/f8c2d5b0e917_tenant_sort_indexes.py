@@ -0,0 +1,30 @@
+"""Tenant-scoped (organization_id, created_at | name, id) indexes for item sorting
+
+Revision ID: f8c2d5b0e917
+Revises: e5b19f7a3c60
+Create Date: 2026-10-18 16:41:37.902514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8c2d5b0e917'
+down_revision: Union[str, None] = 'e5b19f7a3c60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_items_organization_id_created_at', 'items', ['organization_id', 'created_at', 'id'])
+    op.create_index('ix_items_organization_id_name', 'items', ['organization_id', 'name', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_items_organization_id_name', table_name='items')
+    op.drop_index('ix_items_organization_id_created_at', table_name='items')
@@ -0,0 +1,85 @@
+"""
+Simple load benchmark against a running API instance.
+
+Logs in once, then fires concurrent requests at an endpoint and reports throughput and latency percentiles.
+Run it against a build before and after a change to compare, e.g.:
+
+    python3 scripts/benchmark.py --path /items/ --requests 2000 --concurrency 50
+
+Pass --login-storm N to keep N concurrent /auth/login calls running while the endpoint is measured,
+which shows whether password hashing is starving other requests.
+
+To measure the stateless auth fast path, run the API once with STATELESS_AUTH=true and once with
+STATELESS_AUTH=false and benchmark a read endpoint such as --path /items/1.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str):
+    response = await client.post("/auth/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_benchmark(base_url: str, path: str, username: str, password: str, total_requests: int, concurrency: int, login_storm: int = 0):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        token = await login(client, username, password)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        latencies = []
+        errors = 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fire():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+
+        logins = 0
+        storm_running = True
+
+        async def storm():
+            nonlocal logins
+            while storm_running:
+                await login(client, username, password)
+                logins += 1
+
+        storm_tasks = [asyncio.create_task(storm()) for _ in range(login_storm)]
+
+        started = time.perf_counter()
+        await asyncio.gather(*(fire() for _ in range(total_requests)))
+        elapsed = time.perf_counter() - started
+
+        storm_running = False
+        await asyncio.gather(*storm_tasks)
+
+    latencies.sort()
+    p99_index = max(0, int(len(latencies) * 0.99) - 1)
+    print(f"GET {path}: {total_requests} requests, concurrency {concurrency}")
+    if login_storm:
+        print(f"  login storm: {login_storm} concurrent clients, {logins} logins during the run")
+    print(f"  throughput: {total_requests / elapsed:.1f} req/s ({errors} errors)")
+    print(f"  latency p50: {statistics.median(latencies) * 1000:.2f} ms, p99: {latencies[p99_index] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent requests against the API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/items/")
+    parser.add_argument("--username", default="acme\\admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--login-storm", type=int, default=0, help="Concurrent /auth/login clients to run alongside")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.base_url, args.path, args.username, args.password, args.requests, args.concurrency, args.login_storm))
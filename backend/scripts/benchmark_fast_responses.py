@@ -0,0 +1,90 @@
+"""
+Latency of list endpoints with FAST_JSON_RESPONSES on and off.
+
+Tops the caller's organization up to --items items, then requests 1000-row pages of GET /items and the full
+GET /roles/{role_id}/permissions list in-process (no network, same auth work in both modes), alternating the
+fast path and response_model validation, and reports latency percentiles and the speedup:
+
+    python3 scripts/benchmark_fast_responses.py --items 1000 --runs 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy import func, select
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src import models
+from src.bulk import bulk_insert
+from src.config import settings
+from src.database import SessionLocal, engine
+from src.main import app
+
+
+async def fill_organization(organization_id: str, total_items: int):
+    async with SessionLocal() as db:
+        existing = await db.scalar(select(func.count()).select_from(models.Item).filter(models.Item.organization_id == organization_id))
+        now = datetime.now(timezone.utc)
+        rows = [{"name": f"item {index}", "description": f"generated item {index}", "price": round(random.uniform(1, 1000), 2),
+                 "organization_id": organization_id, "created_at": now, "updated_at": now} for index in range(existing, total_items)]
+        await bulk_insert(db, models.Item.__table__, ["name", "description", "price", "organization_id", "created_at", "updated_at"], rows)
+        await db.commit()
+
+
+async def time_requests(client: httpx.AsyncClient, url: str, headers: dict, runs: int):
+    timings = {True: [], False: []}
+    for run in range(runs * 2):
+        fast = run % 2 == 0
+        settings.FAST_JSON_RESPONSES = fast
+        start = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        timings[fast].append(time.perf_counter() - start)
+        response.raise_for_status()
+    return len(response.content), timings
+
+
+def report(label: str, size: int, timings: dict):
+    def percentiles(latencies):
+        latencies = sorted(latencies)
+        return statistics.median(latencies), latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    fast_p50, fast_p95 = percentiles(timings[True])
+    slow_p50, slow_p95 = percentiles(timings[False])
+    print(f"  {label} ({size:,} bytes)")
+    print(f"    response_model: p50 {slow_p50 * 1000:.2f} ms, p95 {slow_p95 * 1000:.2f} ms")
+    print(f"    fast path:      p50 {fast_p50 * 1000:.2f} ms, p95 {fast_p95 * 1000:.2f} ms ({slow_p50 / fast_p50:.1f}x)")
+
+
+async def run_benchmark(username: str, password: str, total_items: int, page_size: int, runs: int):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        response = await client.post("/auth/login", data={"username": username, "password": password})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        me = (await client.get("/auth/users/me/", headers=headers)).json()
+        role_id = (await client.get("/roles/", headers=headers)).json()[0]["id"]
+        await fill_organization(me["organization_id"], total_items)
+
+        print(f"{runs} requests per mode")
+        report(f"GET /items/?limit={page_size}", *await time_requests(client, f"/items/?limit={page_size}", headers, runs))
+        report(f"GET /items/?cursor=&limit={page_size}", *await time_requests(client, f"/items/?cursor=&limit={page_size}", headers, runs))
+        report(f"GET /roles/{role_id}/permissions", *await time_requests(client, f"/roles/{role_id}/permissions", headers, runs))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare list endpoint latency with and without the orjson fast path")
+    parser.add_argument("--username", default="acme\\admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--items", type=int, default=1000, help="Items the caller's organization is topped up to")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.username, args.password, args.items, args.page_size, args.runs))
@@ -0,0 +1,97 @@
+"""
+Latency of typical GET /items filter combinations on a large tenant.
+
+Fills a dedicated organization with --items generated items (skipped when it already has them), and
+--other-tenants more organizations of the same size so the table also holds other tenants' rows, then runs the
+query GET /items builds for each filter combination and reports latency percentiles. Run it before and after
+`alembic upgrade head` to see what the search indexes buy on Postgres, and before and after
+scripts/partition_items.py to see what partitioning items by organization_id buys:
+
+    python3 scripts/benchmark_item_search.py --items 1000000 --runs 50
+    python3 scripts/benchmark_item_search.py --items 1000000 --other-tenants 20 --runs 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src import models, security
+from src.bulk import bulk_insert
+from src.database import SessionLocal, engine
+from src.routers.item import search_items_query
+
+ORGANIZATION_ID = "bench_search"
+WORDS = ["red", "blue", "green", "oak", "steel", "chair", "table", "lamp", "desk", "shelf", "sofa", "rug"]
+BATCH_SIZE = 10000
+
+COMBINATIONS = {
+    "no filters, newest first": {"sort": "-created_at"},
+    "name prefix": {"name": "red"},
+    "full-text word": {"q": "chair"},
+    "full-text two words": {"q": "oak desk"},
+    "price range, cheapest first": {"min_price": 100, "max_price": 150, "sort": "price"},
+    "created in the last 30 days": {"created_after": datetime.now(timezone.utc) - timedelta(days=30)},
+    "prefix + price range": {"name": "blue", "min_price": 10, "max_price": 500},
+    "full-text + price + date": {"q": "lamp", "max_price": 250, "created_after": datetime.now(timezone.utc) - timedelta(days=180)},
+}
+
+
+async def fill_tenant(organization_id: str, total_items: int):
+    async with SessionLocal() as db:
+        if await db.get(models.Organization, organization_id) is None:
+            await db.execute(insert(models.Organization).values(id=organization_id, name=organization_id, slug=organization_id))
+        existing = await db.scalar(select(func.count()).select_from(models.Item).filter(models.Item.organization_id == organization_id))
+        now = datetime.now(timezone.utc)
+        columns = ["name", "description", "price", "organization_id", "created_at", "updated_at"]
+        for start in range(existing, total_items, BATCH_SIZE):
+            rows = []
+            for _ in range(start, min(start + BATCH_SIZE, total_items)):
+                created_at = now - timedelta(seconds=random.randrange(365 * 24 * 3600))
+                name = " ".join(random.sample(WORDS, 3))
+                rows.append({"name": name, "description": name, "price": round(random.uniform(1, 1000), 2),
+                             "organization_id": organization_id, "created_at": created_at, "updated_at": created_at})
+            await bulk_insert(db, models.Item.__table__, columns, rows)
+            await db.commit()
+        return max(existing, total_items)
+
+
+async def run_benchmark(total_items: int, other_tenants: int, runs: int, limit: int):
+    tenant_size = await fill_tenant(ORGANIZATION_ID, total_items)
+    for tenant in range(other_tenants):
+        await fill_tenant(f"{ORGANIZATION_ID}_{tenant}", total_items)
+    principal = security.TokenPrincipal(id=0, username="bench", organization_id=ORGANIZATION_ID, is_platform_admin=False, permission_mask=0)
+
+    print(f"Tenant {ORGANIZATION_ID} with {tenant_size} items ({other_tenants} other tenants), first page of {limit}, {runs} runs each")
+    async with SessionLocal() as db:
+        dialect_name = db.get_bind().dialect.name
+        for label, filters in COMBINATIONS.items():
+            items_query = search_items_query(dialect_name, principal, **filters).limit(limit)
+            latencies = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                (await db.scalars(items_query)).all()
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+            print(f"  {label}: p50 {statistics.median(latencies) * 1000:.2f} ms, p95 {p95 * 1000:.2f} ms")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark item search and filtering on a large tenant")
+    parser.add_argument("--items", type=int, default=1000000)
+    parser.add_argument("--other-tenants", type=int, default=0, help="Organizations of the same size filled alongside")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.items, args.other_tenants, args.runs, args.limit))
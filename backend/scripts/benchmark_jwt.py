@@ -0,0 +1,50 @@
+"""
+Microbenchmark of access token verification.
+
+Signs a token shaped like the ones /auth/login issues, then times verifying it with each JWT backend
+(python-jose and PyJWT) and through the verified-token cache in src/security.py:
+
+    python3 scripts/benchmark_jwt.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src import security
+
+
+def time_decode(decode, token: str, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decode(token)
+    return time.perf_counter() - start
+
+
+def main(iterations: int):
+    claims = {"sub": "admin", "organization_id": "org_1", "pm": "_v8B", "pv": "0123456789ab",
+              "uid": 2, "pa": False, "jti": "0" * 32, "ver": security.token_version()}
+    token = security.create_access_token(claims, timedelta(minutes=30))
+
+    results = {}
+    for name, codec_class in security.TOKEN_CODECS.items():
+        codec = codec_class(security.SECRET_KEY, security.ALGORITHM)
+        results[f"{name} decode"] = time_decode(codec.decode, token, iterations)
+        results[f"{name} encode"] = time_decode(lambda _: codec.encode(claims), token, iterations)
+    results[f"cached decode ({security.settings.JWT_BACKEND} on miss)"] = time_decode(security.decode_token, token, iterations)
+
+    print(f"{iterations} iterations")
+    for name, elapsed in results.items():
+        print(f"  {name}: {iterations / elapsed:,.0f} ops/s ({elapsed / iterations * 1_000_000:.1f} µs each)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure JWT verification throughput per backend")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    main(args.iterations)
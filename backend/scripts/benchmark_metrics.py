@@ -0,0 +1,59 @@
+"""
+Microbenchmark of the per-request overhead added by MetricsMiddleware.
+
+Drives a no-op ASGI app directly (no server, no network) with and without the middleware and reports the
+difference per request, to compare against the budget documented in src/metrics.py:
+
+    python3 scripts/benchmark_metrics.py --requests 200000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src.metrics import MetricsMiddleware
+
+
+class Route:
+    path = "/items/{item_id}"
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def time_app(app, total_requests: int):
+    start = time.perf_counter()
+    for _ in range(total_requests):
+        await app({"type": "http", "method": "GET", "path": "/items/1"}, receive, send)
+    return time.perf_counter() - start
+
+
+async def main(total_requests: int):
+    bare = await time_app(endpoint, total_requests)
+    instrumented = await time_app(MetricsMiddleware(endpoint), total_requests)
+    overhead_us = (instrumented - bare) / total_requests * 1_000_000
+    print(f"{total_requests} requests: bare {bare:.3f}s, instrumented {instrumented:.3f}s")
+    print(f"  middleware overhead: {overhead_us:.2f} µs per request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure MetricsMiddleware overhead")
+    parser.add_argument("--requests", type=int, default=200000)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.requests))
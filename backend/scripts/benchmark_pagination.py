@@ -0,0 +1,92 @@
+"""
+Latency of a deep page of GET /items with offset pagination (?skip=) versus keyset pagination (?cursor=).
+
+Fills a dedicated organization with --items generated items (skipped when it already has them), then fetches
+page --page of --limit rows both ways through the same paginate() call GET /items makes, and reports latency
+percentiles. The keyset cursor for the page is looked up once, outside the timing, as a client walking the
+pages would already hold it:
+
+    python3 scripts/benchmark_pagination.py --items 200000 --page 1000 --runs 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import func, insert, select
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src import models, security
+from src.bulk import bulk_insert
+from src.database import SessionLocal, engine
+from src.pagination import encode_cursor, paginate
+from src.routers.item import search_items_query
+
+ORGANIZATION_ID = "bench_pagination"
+BATCH_SIZE = 10000
+
+
+async def fill_tenant(organization_id: str, total_items: int):
+    async with SessionLocal() as db:
+        if await db.get(models.Organization, organization_id) is None:
+            await db.execute(insert(models.Organization).values(id=organization_id, name=organization_id, slug=organization_id))
+        existing = await db.scalar(select(func.count()).select_from(models.Item).filter(models.Item.organization_id == organization_id))
+        now = datetime.now(timezone.utc)
+        columns = ["name", "description", "price", "organization_id", "created_at", "updated_at"]
+        for start in range(existing, total_items, BATCH_SIZE):
+            rows = [{"name": f"item {index}", "description": None, "price": round(random.uniform(1, 1000), 2),
+                     "organization_id": organization_id, "created_at": now, "updated_at": now}
+                    for index in range(start, min(start + BATCH_SIZE, total_items))]
+            await bulk_insert(db, models.Item.__table__, columns, rows)
+            await db.commit()
+        return max(existing, total_items)
+
+
+async def time_page(db, items_query, skip: int, limit: int, cursor: str | None, runs: int):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        page = await paginate(db, items_query, models.Item.id, skip, limit, cursor)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return page, statistics.median(latencies), latencies[max(0, int(len(latencies) * 0.95) - 1)]
+
+
+async def run_benchmark(total_items: int, page: int, limit: int, runs: int):
+    tenant_size = await fill_tenant(ORGANIZATION_ID, total_items)
+    principal = security.TokenPrincipal(id=0, username="bench", organization_id=ORGANIZATION_ID, is_platform_admin=False, permission_mask=0)
+    skip = (page - 1) * limit
+    if skip >= tenant_size:
+        sys.exit(f"Page {page} of {limit} rows is past the end of {tenant_size} items; raise --items")
+
+    async with SessionLocal() as db:
+        items_query = search_items_query(db.get_bind().dialect.name, principal)
+        last_id_before_page = await db.scalar(items_query.with_only_columns(models.Item.id).offset(skip - 1).limit(1)) if skip else None
+        cursor = encode_cursor(last_id_before_page) if last_id_before_page is not None else ""
+
+        print(f"Tenant {ORGANIZATION_ID} with {tenant_size} items, page {page} of {limit} rows, {runs} runs each")
+        offset_page, offset_p50, offset_p95 = await time_page(db, items_query, skip, limit, None, runs)
+        keyset_page, keyset_p50, keyset_p95 = await time_page(db, items_query, 0, limit, cursor, runs)
+        if [item.id for item in offset_page] != [item.id for item in keyset_page["items"]]:
+            sys.exit("Offset and keyset pagination returned different rows")
+        print(f"  offset (?skip={skip}): p50 {offset_p50 * 1000:.2f} ms, p95 {offset_p95 * 1000:.2f} ms")
+        print(f"  keyset (?cursor=):    p50 {keyset_p50 * 1000:.2f} ms, p95 {keyset_p95 * 1000:.2f} ms")
+        print(f"  keyset is {offset_p50 / keyset_p50:.1f}x faster at p50")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare deep-page latency of offset and keyset pagination on GET /items")
+    parser.add_argument("--items", type=int, default=200000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.items, args.page, args.limit, args.runs))
@@ -0,0 +1,94 @@
+"""
+Benchmark of POST /roles/{role_id}/members:batch against a running API instance.
+
+Creates --users throwaway users in the admin's organization directly in the database, assigns a throwaway role to
+all of them in a single batch request, and compares that with assigning it one user at a time through
+PATCH /users/{user_id}/roles (measured on --per-user-sample users and extrapolated). Everything it creates is
+removed afterwards:
+
+    python3 scripts/benchmark_role_members_batch.py --users 10000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from sqlalchemy import delete, insert, select
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src import models, utils
+from src.database import SessionLocal, engine
+
+USERNAME_PREFIX = "bench_batch_"
+
+
+async def create_fixtures(organization_id: str, total_users: int):
+    async with SessionLocal() as db:
+        password = utils.hash_password("bench")
+        await db.execute(insert(models.User), [
+            {"username": f"{USERNAME_PREFIX}{index}", "organization_id": organization_id, "password": password}
+            for index in range(total_users)
+        ])
+        role_id = await db.scalar(insert(models.Role).values(name=f"{USERNAME_PREFIX}role").returning(models.Role.id))
+        user_ids = list(await db.scalars(select(models.User.id).filter(models.User.username.startswith(USERNAME_PREFIX)).order_by(models.User.id)))
+        await db.commit()
+    return role_id, user_ids
+
+
+async def drop_fixtures(role_id: int):
+    async with SessionLocal() as db:
+        await db.execute(delete(models.user_effective_permissions).filter(models.user_effective_permissions.c.user_id.in_(
+            select(models.User.id).filter(models.User.username.startswith(USERNAME_PREFIX)))))
+        await db.execute(delete(models.user_roles).filter(models.user_roles.c.role_id == role_id))
+        await db.execute(delete(models.Role).filter(models.Role.id == role_id))
+        await db.execute(delete(models.User).filter(models.User.username.startswith(USERNAME_PREFIX)))
+        await db.commit()
+    await engine.dispose()
+
+
+async def run_benchmark(base_url: str, username: str, password: str, organization_id: str, total_users: int, per_user_sample: int):
+    role_id, user_ids = await create_fixtures(organization_id, total_users)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+            response = await client.post("/auth/login", data={"username": username, "password": password})
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            sample_ids, batch_ids = user_ids[:per_user_sample], user_ids[per_user_sample:]
+
+            start = time.perf_counter()
+            for user_id in sample_ids:
+                response = await client.patch(f"/users/{user_id}/roles", json={"add": [role_id]}, headers=headers)
+                response.raise_for_status()
+            per_user = (time.perf_counter() - start) / max(len(sample_ids), 1)
+
+            start = time.perf_counter()
+            added = 0
+            async with client.stream("POST", f"/roles/{role_id}/members:batch", json={"user_ids": batch_ids}, headers=headers) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    added += '"added"' in line
+            batch = time.perf_counter() - start
+    finally:
+        await drop_fixtures(role_id)
+
+    print(f"Assigning a role to {len(batch_ids)} users")
+    print(f"  one batch request: {batch:.2f}s ({added} added)")
+    print(f"  one request per user: {per_user * 1000:.2f} ms each, ~{per_user * len(batch_ids):.2f}s extrapolated from {len(sample_ids)} users")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bulk role assignment")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", default="acme\\admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--organization-id", default="org_1")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--per-user-sample", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.base_url, args.username, args.password, args.organization_id, args.users + args.per_user_sample, args.per_user_sample))
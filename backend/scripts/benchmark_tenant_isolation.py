@@ -0,0 +1,124 @@
+"""
+Latency of tenant-scoped item queries under TENANT_ISOLATION=filter versus TENANT_ISOLATION=rls.
+
+Fills --tenants organizations with --items items each (skipping what is already there), then runs the queries
+GET /items builds the way a request does, one session per run: in filter mode with the organization_id clause
+and an unbound session, in rls mode without the clause and a session bound to the tenant (one extra
+SET ROLE / set_config per transaction). Needs Postgres with `alembic upgrade head` applied, or --temporary
+for a throwaway local server through testing.postgresql:
+
+    python3 scripts/benchmark_tenant_isolation.py --tenants 20 --items 50000 --runs 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+ORGANIZATION_PREFIX = "bench_tenant_"
+BATCH_SIZE = 10000
+
+COMBINATIONS = {
+    "first page": {},
+    "newest first": {"sort": "-created_at"},
+    "name prefix": {"name": "item 1"},
+    "price range, cheapest first": {"min_price": 100, "max_price": 150, "sort": "price"},
+}
+
+
+async def fill_tenants(tenants: int, items_per_tenant: int):
+    from src import models
+    from src.bulk import bulk_insert
+    from src.database import SessionLocal
+
+    now = datetime.now(timezone.utc)
+    columns = ["name", "description", "price", "organization_id", "created_at", "updated_at"]
+    async with SessionLocal() as db:
+        for tenant in range(tenants):
+            organization_id = f"{ORGANIZATION_PREFIX}{tenant}"
+            if await db.get(models.Organization, organization_id) is None:
+                await db.execute(insert(models.Organization).values(id=organization_id, name=organization_id, slug=organization_id))
+            existing = await db.scalar(select(func.count()).select_from(models.Item).filter(models.Item.organization_id == organization_id))
+            for start in range(existing, items_per_tenant, BATCH_SIZE):
+                rows = []
+                for _ in range(start, min(start + BATCH_SIZE, items_per_tenant)):
+                    created_at = now - timedelta(seconds=random.randrange(365 * 24 * 3600))
+                    rows.append({"name": f"item {random.randrange(1_000_000)}", "description": None, "price": round(random.uniform(1, 1000), 2),
+                                 "organization_id": organization_id, "created_at": created_at, "updated_at": created_at})
+                await bulk_insert(db, models.Item.__table__, columns, rows)
+            await db.commit()
+
+
+async def time_mode(mode: str, principals: list, filters: dict, runs: int, limit: int):
+    from src.config import settings
+    from src.database import SessionLocal
+    from src.routers.item import search_items_query
+    from src.tenancy import bind_tenant
+
+    settings.TENANT_ISOLATION = mode
+    latencies = []
+    for run in range(runs):
+        principal = principals[run % len(principals)]
+        start = time.perf_counter()
+        async with SessionLocal() as db:
+            await bind_tenant(db, principal)
+            items_query = search_items_query(db.get_bind().dialect.name, principal, **filters).limit(limit)
+            (await db.scalars(items_query)).all()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies), latencies[max(0, int(len(latencies) * 0.95) - 1)]
+
+
+async def run_benchmark(create_schema: bool, tenants: int, items_per_tenant: int, runs: int, limit: int):
+    # Imported here so --temporary can point DATABASE_URL at the throwaway server first
+    from src import security
+    from src.database import Base, engine
+    from src.tenancy import verify_rls
+
+    if create_schema:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+    await verify_rls(engine)
+    await fill_tenants(tenants, items_per_tenant)
+
+    principals = [security.TokenPrincipal(id=0, username="bench", organization_id=f"{ORGANIZATION_PREFIX}{tenant}",
+                                          is_platform_admin=False, permission_mask=0) for tenant in range(tenants)]
+    print(f"{tenants} tenants with {items_per_tenant} items each, first page of {limit}, {runs} runs each")
+    for label, filters in COMBINATIONS.items():
+        filter_p50, filter_p95 = await time_mode("filter", principals, filters, runs, limit)
+        rls_p50, rls_p95 = await time_mode("rls", principals, filters, runs, limit)
+        print(f"  {label}: filter p50 {filter_p50 * 1000:.2f} ms, p95 {filter_p95 * 1000:.2f} ms | "
+              f"rls p50 {rls_p50 * 1000:.2f} ms, p95 {rls_p95 * 1000:.2f} ms")
+    await engine.dispose()
+
+
+def main(temporary: bool, tenants: int, items_per_tenant: int, runs: int, limit: int):
+    if not temporary:
+        return asyncio.run(run_benchmark(False, tenants, items_per_tenant, runs, limit))
+    try:
+        import testing.postgresql
+    except ImportError:
+        sys.exit("--temporary needs testing.postgresql: pip install testing.postgresql")
+    with testing.postgresql.Postgresql() as postgresql:
+        os.environ["DATABASE_URL"] = postgresql.url()
+        return asyncio.run(run_benchmark(True, tenants, items_per_tenant, runs, limit))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare tenant-scoped query latency with explicit filters and with row-level security")
+    parser.add_argument("--temporary", action="store_true", help="Run against a throwaway local Postgres (testing.postgresql)")
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--items", type=int, default=50000, help="Items per tenant")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    main(args.temporary, args.tenants, args.items, args.runs, args.limit)
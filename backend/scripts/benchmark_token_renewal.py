@@ -0,0 +1,73 @@
+"""
+Load comparison of renewing access tokens through /auth/login versus /auth/refresh, against a running API instance.
+
+Each concurrent client renews its token repeatedly: the login run re-sends the password every time (bcrypt),
+the refresh run exchanges its current refresh token for the next one:
+
+    python3 scripts/benchmark_token_renewal.py --requests 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def run_clients(renew, total_requests: int, concurrency: int):
+    latencies = []
+    errors = 0
+    per_client = [total_requests // concurrency + (index < total_requests % concurrency) for index in range(concurrency)]
+
+    async def client_loop(requests: int):
+        nonlocal errors
+        state = await renew(None)
+        for _ in range(requests):
+            start = time.perf_counter()
+            try:
+                state = await renew(state)
+            except httpx.HTTPStatusError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(requests) for requests in per_client))
+    return time.perf_counter() - started, latencies, errors
+
+
+def report(name: str, total_requests: int, elapsed: float, latencies: list, errors: int):
+    latencies.sort()
+    p99_index = max(0, int(len(latencies) * 0.99) - 1)
+    print(f"{name}: {total_requests} renewals")
+    print(f"  throughput: {total_requests / elapsed:.1f} req/s ({errors} errors)")
+    print(f"  latency p50: {statistics.median(latencies) * 1000:.2f} ms, p99: {latencies[p99_index] * 1000:.2f} ms")
+
+
+async def run_benchmark(base_url: str, username: str, password: str, total_requests: int, concurrency: int):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        async def login(_):
+            response = await client.post("/auth/login", data={"username": username, "password": password})
+            response.raise_for_status()
+            return response.json()["refresh_token"]
+
+        async def refresh(refresh_token):
+            if refresh_token is None:
+                return await login(None)
+            response = await client.post("/auth/refresh", json={"refresh_token": refresh_token})
+            response.raise_for_status()
+            return response.json()["refresh_token"]
+
+        report("POST /auth/login", total_requests, *await run_clients(login, total_requests, concurrency))
+        report("POST /auth/refresh", total_requests, *await run_clients(refresh, total_requests, concurrency))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare token renewal through login and refresh")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", default="acme\\admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.base_url, args.username, args.password, args.requests, args.concurrency))
@@ -0,0 +1,78 @@
+"""
+Row error check for POST /items/bulk.
+
+Imports an NDJSON body mixing valid rows with rows the import must report and skip (over-long name or description,
+invalid UTF-8, a missing price, and on Postgres a NUL character, which only the database refuses and which sends
+its batch through the row-by-row retry), in-process, and exits non-zero unless exactly the valid rows are
+inserted and every bad row is reported under its own row number. The imported items are deleted afterwards.
+Run it against a seeded database:
+
+    python3 scripts/check_bulk_import.py --username "acme\\admin" --password admin
+"""
+import argparse
+import json
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src.database import engine
+from src.main import app
+
+NAME_PREFIX = "bulk import check"
+
+
+def main(username: str, password: str) -> int:
+    # (row, expected to be inserted)
+    rows = [
+        (json.dumps({"name": f"{NAME_PREFIX} 1", "price": 1}).encode(), True),
+        (json.dumps({"name": f"{NAME_PREFIX} " + "x" * 50, "price": 2}).encode(), False),
+        (json.dumps({"name": f"{NAME_PREFIX} 3", "description": "x" * 101, "price": 3}).encode(), False),
+        (json.dumps({"name": f"{NAME_PREFIX} 4", "price": 4}).encode()[:-2] + b"\xff}", False),
+        (json.dumps({"name": f"{NAME_PREFIX} 5"}).encode(), False),
+        (json.dumps({"name": f"{NAME_PREFIX} 6\u0000", "price": 6}).encode(), engine.dialect.name != "postgresql"),
+        (json.dumps({"name": f"{NAME_PREFIX} 7", "description": "x" * 100, "price": 7}).encode(), True),
+    ]
+    expected_failures = {row_number for row_number, (_, inserted) in enumerate(rows, start=1) if not inserted}
+
+    with TestClient(app) as client:
+        response = client.post("/auth/login", data={"username": username, "password": password})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = client.post("/items/bulk", headers={**headers, "Content-Type": "application/x-ndjson"},
+                               content=b"\n".join(row for row, _ in rows))
+        print(f"POST /items/bulk: {response.status_code} {response.text}")
+        failures = 0
+        if response.status_code != 200:
+            failures += 1
+        else:
+            result = response.json()
+            reported = {error["row"] for error in result["errors"]}
+            for row_number in range(1, len(rows) + 1):
+                expected = "reported" if row_number in expected_failures else "inserted"
+                actual = "reported" if row_number in reported else "inserted"
+                failures += expected != actual
+                print(f"{'ok  ' if expected == actual else 'FAIL'} row {row_number} {actual} (expected {expected})")
+            if result["inserted"] != len(rows) - len(expected_failures):
+                failures += 1
+                print(f"FAIL {result['inserted']} rows inserted, expected {len(rows) - len(expected_failures)}")
+
+        # Clean up whatever was imported
+        for item in client.get("/items/", headers=headers, params={"name": NAME_PREFIX, "limit": 100}).json():
+            client.delete(f"/items/{item['id']}", headers=headers)
+
+    print(f"{failures} bulk import checks failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if POST /items/bulk does not report and skip bad rows")
+    parser.add_argument("--username", default="acme\\admin")
+    parser.add_argument("--password", default="admin")
+    args = parser.parse_args()
+
+    sys.exit(main(args.username, args.password))
@@ -0,0 +1,39 @@
+"""
+Consistency check for the derived user_effective_permissions table.
+
+Compares it with what user_roles/role_permissions grant and, with --rebuild, recomputes it from scratch:
+
+    python3 scripts/check_effective_permissions.py [--rebuild]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src.database import SessionLocal, engine
+from src.permissions import check_effective_permissions, refresh_effective_permissions
+
+
+async def main(rebuild: bool):
+    async with SessionLocal() as db:
+        drift = await check_effective_permissions(db)
+        print(f"Missing rows: {drift['missing']}, stale rows: {drift['stale']}")
+
+        if rebuild:
+            print("Rebuilding user_effective_permissions...")
+            await refresh_effective_permissions(db)
+            await db.commit()
+            drift = await check_effective_permissions(db)
+            print(f"After rebuild - missing rows: {drift['missing']}, stale rows: {drift['stale']}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check (and optionally rebuild) user_effective_permissions")
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rebuild))
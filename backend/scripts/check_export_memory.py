@@ -0,0 +1,91 @@
+"""
+Memory ceiling check for the streaming exports.
+
+Tops a dedicated organization up to --items items, then drains the GET /items/export body generator for a tenth
+of them and for all of them, in both formats, under tracemalloc. Exits non-zero if the peak Python allocation
+of an export goes over --max-mb, or if the full export peaks more than twice as high as the tenth: an export
+that streams holds one batch at a time, whatever the tenant's size.
+
+    python3 scripts/check_export_memory.py --items 200000 --max-mb 16
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+
+from sqlalchemy import func, insert, select
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src import models, security
+from src.bulk import bulk_insert, iter_export
+from src.database import SessionLocal, engine
+from src.routers.item import export_items_query
+
+ORGANIZATION_ID = "export_memory_check"
+BATCH_SIZE = 10000
+
+
+async def fill_tenant(organization_id: str, total_items: int):
+    async with SessionLocal() as db:
+        if await db.get(models.Organization, organization_id) is None:
+            await db.execute(insert(models.Organization).values(id=organization_id, name=organization_id, slug=organization_id))
+        existing = await db.scalar(select(func.count()).select_from(models.Item).filter(models.Item.organization_id == organization_id))
+        now = datetime.now(timezone.utc)
+        columns = ["name", "description", "price", "organization_id", "created_at", "updated_at"]
+        for start in range(existing, total_items, BATCH_SIZE):
+            rows = [{"name": f"item {index}", "description": f"generated item {index} " * 4, "price": round(random.uniform(1, 1000), 2),
+                     "organization_id": organization_id, "created_at": now, "updated_at": now}
+                    for index in range(start, min(start + BATCH_SIZE, total_items))]
+            await bulk_insert(db, models.Item.__table__, columns, rows)
+            await db.commit()
+        return max(existing, total_items)
+
+
+async def export_peak(query, export_format: str, principal) -> tuple[int, int]:
+    """Rows exported and peak traced allocation while draining the export, in bytes."""
+    tracemalloc.start()
+    rows = 0
+    try:
+        async for chunk in iter_export(query, export_format, principal):
+            rows += chunk.count("\n")
+        header_rows = 1 if export_format == "csv" else 0
+        return rows - header_rows, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+async def main(total_items: int, max_mb: float) -> int:
+    tenant_size = await fill_tenant(ORGANIZATION_ID, total_items)
+    principal = security.TokenPrincipal(id=0, username="export_check", organization_id=ORGANIZATION_ID, is_platform_admin=False, permission_mask=0)
+    items_query = export_items_query(principal)
+
+    failures = 0
+    print(f"Tenant {ORGANIZATION_ID} with {tenant_size} items, ceiling {max_mb:g} MB")
+    for export_format in ("ndjson", "csv"):
+        peaks = {}
+        for rows in (tenant_size // 10, tenant_size):
+            exported, peaks[rows] = await export_peak(items_query.limit(rows), export_format, principal)
+            over = peaks[rows] > max_mb * 1024 * 1024
+            failures += over
+            print(f"{'FAIL' if over else 'ok  '} {export_format}, {exported} rows: peak {peaks[rows] / 1024 / 1024:.2f} MB")
+        grows = peaks[tenant_size] > 2 * peaks[tenant_size // 10]
+        failures += grows
+        print(f"{'FAIL' if grows else 'ok  '} {export_format}: peak for 10x the rows is {peaks[tenant_size] / peaks[tenant_size // 10]:.2f}x")
+    await engine.dispose()
+
+    print(f"{failures} export memory checks failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if streaming an export holds more memory than a fixed ceiling")
+    parser.add_argument("--items", type=int, default=200000)
+    parser.add_argument("--max-mb", type=float, default=16, help="Ceiling for the peak traced allocation of one export")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args.items, args.max_mb)))
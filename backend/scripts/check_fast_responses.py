@@ -0,0 +1,77 @@
+"""
+Conformance check for FAST_JSON_RESPONSES.
+
+Requests every endpoint that answers with a FastJSONResponse twice, in-process, once with the fast path and once
+through response_model validation, and exits non-zero if the bodies differ or the fast body does not validate
+against the route's response_model. Run it against a seeded database whenever a response schema or one of
+those queries changes:
+
+    python3 scripts/check_fast_responses.py --username "acme\\admin" --password admin
+"""
+import argparse
+import os
+import sys
+
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src.config import settings
+from src.main import app
+
+
+def route_response_model(path: str):
+    for route in app.routes:
+        if getattr(route, "path", None) == path and "GET" in route.methods:
+            return route.response_model
+    raise LookupError(path)
+
+
+def main(username: str, password: str) -> int:
+    failures = 0
+    with TestClient(app) as client:
+        response = client.post("/auth/login", data={"username": username, "password": password})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        user_id = client.get("/auth/users/me/", headers=headers).json()["id"]
+        role_id = client.get("/roles/", headers=headers).json()[0]["id"]
+
+        requests = {
+            "/items/": ["/items/?limit=1000", "/items/?sort=-price&limit=50", "/items/?cursor=&limit=5", "/items/?name=zzz-no-match"],
+            "/roles/{role_id}/permissions": [f"/roles/{role_id}/permissions", f"/roles/{role_id}/permissions?limit=5&skip=1"],
+            "/users/{user_id}/roles": [f"/users/{user_id}/roles", f"/users/{user_id}/roles?name=a&limit=5"],
+        }
+        for path, urls in requests.items():
+            response_model = TypeAdapter(route_response_model(path))
+            for url in urls:
+                bodies = {}
+                for fast in (True, False):
+                    settings.FAST_JSON_RESPONSES = fast
+                    response = client.get(url, headers=headers)
+                    response.raise_for_status()
+                    bodies[fast] = response
+                problems = []
+                if bodies[True].json() != bodies[False].json():
+                    problems.append("body differs from the validated response")
+                try:
+                    response_model.validate_json(bodies[True].content)
+                except ValueError as e:
+                    problems.append(f"does not match the response model: {e}")
+                failures += bool(problems)
+                rows = bodies[True].json()
+                count = len(rows["items"]) if isinstance(rows, dict) else len(rows)
+                print(f"{'FAIL' if problems else 'ok  '} GET {url} ({count} rows)" + (f": {'; '.join(problems)}" if problems else ""))
+
+    print(f"{failures} fast responses do not conform")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if a FastJSONResponse endpoint drifts from its response_model")
+    parser.add_argument("--username", default="acme\\admin")
+    parser.add_argument("--password", default="admin")
+    args = parser.parse_args()
+
+    sys.exit(main(args.username, args.password))
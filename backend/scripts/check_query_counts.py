@@ -0,0 +1,104 @@
+"""
+Query-count regression check.
+
+Logs in and requests a set of endpoints in-process, reading the X-DB-Queries header the metrics middleware fills
+from the engine's after_cursor_execute hook, and exits non-zero when an endpoint issues more statements than its
+budget. Login is also measured for a user holding one role and for one holding --roles roles, which must cost
+the same: permissions are resolved in one query, not one per role. Each endpoint is requested once before it is
+measured, so the budgets are for warm principal and catalog caches. Run it against a seeded database:
+
+    python3 scripts/check_query_counts.py --username "acme\\admin" --password admin
+"""
+import argparse
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src.main import app
+
+# Organization, user, effective permissions, expired refresh token purge, refresh token
+LOGIN_QUERIES = 5
+
+ENDPOINT_QUERIES = {
+    "/auth/users/me/": 0,
+    "/items/": 1,
+    "/items/?cursor=": 1,
+    "/items/?q=chair&sort=-price": 1,
+    "/users/": 1,
+    "/users/?cursor=": 1,
+    "/roles/": 1,
+    "/roles/?cursor=": 1,
+    "/roles/{role_id}": 1,
+    "/roles/{role_id}?expand=users,permissions": 3,
+    "/roles/{role_id}/permissions": 2,
+    "/users/{user_id}/roles": 2,
+    "/permissions/": 1,
+}
+
+
+def query_count(response) -> int:
+    response.raise_for_status()
+    return int(response.headers["X-DB-Queries"])
+
+
+def main(username: str, password: str, roles: int) -> int:
+    failures = 0
+    def check(label: str, queries: int, budget: int):
+        nonlocal failures
+        failures += queries > budget
+        print(f"{'FAIL' if queries > budget else 'ok  '} {label}: {queries} queries (budget {budget})")
+
+    with TestClient(app) as client:
+        def login(username: str, password: str):
+            response = client.post("/auth/login", data={"username": username, "password": password})
+            return response, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        login(username, password)
+        response, headers = login(username, password)
+        check("POST /auth/login", query_count(response), LOGIN_QUERIES)
+
+        me = client.get("/auth/users/me/", headers=headers).json()
+        placeholders = {"user_id": me["id"], "role_id": client.get("/roles/", headers=headers).json()[0]["id"]}
+        for path, budget in ENDPOINT_QUERIES.items():
+            url = path.format(**placeholders)
+            client.get(url, headers=headers)
+            check(f"GET {url}", query_count(client.get(url, headers=headers)), budget)
+
+        # Login must not grow with the number of roles held
+        organization_slug = username.split("\\", 1)[0]
+        role_ids, user_ids = [], []
+        try:
+            for index in range(roles):
+                role = client.post("/roles/", headers=headers, json={"name": f"query count check {index}"})
+                role.raise_for_status()
+                role_ids.append(role.json()["id"])
+            for label, held_roles in (("1 role", role_ids[:1]), (f"{roles} roles", role_ids)):
+                user = client.post("/users/", headers=headers, json={"username": f"query_count_{len(held_roles)}", "password": "query-count",
+                                                                     "organization_id": me["organization_id"]})
+                user.raise_for_status()
+                user_ids.append(user.json()["id"])
+                client.post(f"/users/{user_ids[-1]}/roles", headers=headers, json=held_roles).raise_for_status()
+                response, _ = login(f"{organization_slug}\\query_count_{len(held_roles)}", "query-count")
+                check(f"POST /auth/login with {label}", query_count(response), LOGIN_QUERIES)
+        finally:
+            for user_id in user_ids:
+                client.delete(f"/users/{user_id}", headers=headers)
+            for role_id in role_ids:
+                client.delete(f"/roles/{role_id}", headers=headers)
+
+    print(f"{failures} endpoints over their query budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if an endpoint issues more database statements than its budget")
+    parser.add_argument("--username", default="acme\\admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--roles", type=int, default=25, help="Roles held by the many-roles login")
+    args = parser.parse_args()
+
+    sys.exit(main(args.username, args.password, args.roles))
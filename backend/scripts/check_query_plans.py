@@ -0,0 +1,255 @@
+"""
+Query-plan check for the tenant-scoped queries the routers run.
+
+EXPLAINs each query, built by the same functions the routers call (as a tenant admin, not a platform admin), and
+exits non-zero if any of them falls back to a full scan of a tenant table: a Seq Scan on Postgres, a SCAN on
+SQLite. The queries are checked under both TENANT_ISOLATION modes: with explicit organization filters, and on
+Postgres with the filters left to the row-level security policies of a tenant-bound session. Once items is hash-partitioned (see
+scripts/partition_items.py), a query on items must also be pruned to a single partition. Lookups on the user_roles
+and role_permissions association tables, in either direction, must be served by their primary key or reverse
+index. Planners prefer scans on small tables, so run it against a large dataset; --seed fills --tenants
+organizations with --items items and --users users each, gives each new user a role (skipping what is already
+there) and refreshes planner statistics:
+
+    python3 scripts/check_query_plans.py --seed --tenants 20 --items 50000 --users 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, literal, select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src import models, security
+from src.bulk import bulk_insert
+from src.config import settings
+from src.crud import delete_returning_query, update_returning_query
+from src.database import SessionLocal, engine
+from src.pagination import encode_cursor, page_query
+from src.routers.item import export_items_query, item_criteria, search_items_query
+from src.routers.role import member_ids_in_scope_query, role_users_query
+from src.routers.user import export_users_query, users_query
+from src.tenancy import bind_tenant, verify_rls
+
+TENANT_TABLES = {"items", "users"}
+ORGANIZATION_PREFIX = "plan_check_"
+BATCH_SIZE = 10000
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (TABLE )?(?P<table>\w+)")
+PRIMARY_KEY = None # Placeholder for the table's primary key index, whose name differs per dialect
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+    _inline = False # Read by the compiler when the explained statement is an UPDATE or DELETE
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def compile_explain_postgresql(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+@compiles(Explain, "sqlite")
+def compile_explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.statement, **kw)
+
+
+def tenant_queries(dialect_name: str, principal: security.TokenPrincipal):
+    """The tenant-scoped statements issued by the item, user and role routers, from the routers' own builders."""
+    recent = datetime.now(timezone.utc) - timedelta(days=30)
+    items_page = lambda cursor=None, **filters: page_query(search_items_query(dialect_name, principal, **filters), models.Item.id, 0, 10, cursor)
+    return {
+        "GET /items": items_page(),
+        "GET /items?sort=-created_at": items_page(sort="-created_at"),
+        "GET /items?sort=name": items_page(sort="name"),
+        "GET /items?sort=price": items_page(sort="price"),
+        "GET /items?created_after=": items_page(created_after=recent, sort="-created_at"),
+        "GET /items?min_price=&max_price=": items_page(min_price=10, max_price=20, sort="price"),
+        "GET /items?name=": items_page(name="red"),
+        "GET /items?cursor=": items_page(cursor=encode_cursor(1)),
+        "GET /items/export": export_items_query(principal),
+        "GET /items/{id}": select(models.Item).filter(*item_criteria(principal, 1)),
+        "PUT /items/{id}": update_returning_query(models.Item, {"name": "x"}, *item_criteria(principal, 1)),
+        "DELETE /items/{id}": delete_returning_query(models.Item, *item_criteria(principal, 1)),
+        "GET /users": page_query(users_query(principal), models.User.id, 0, 10, None),
+        "GET /users?cursor=": page_query(users_query(principal), models.User.id, 0, 10, encode_cursor(1)),
+        "GET /users/export": export_users_query(principal),
+        "GET /roles/{id}/users": page_query(role_users_query(principal, 1), models.User.id, 0, 10, None),
+        "POST /roles/{id}/members:batch": member_ids_in_scope_query(principal, [1, 2, 3]),
+    }
+
+
+def association_lookups():
+    """The association table lookups the routers and src.permissions run, each with the index that must serve it."""
+    user_roles, role_permissions = models.user_roles.c, models.role_permissions.c
+    return {
+        "user_roles by user_id (GET /users/{id}/roles)": (
+            select(user_roles.role_id).filter(user_roles.user_id == 1), "user_roles", PRIMARY_KEY),
+        "user_roles by user_id and role_id (membership)": (
+            select(user_roles.user_id).filter(user_roles.user_id == 1, user_roles.role_id == 1), "user_roles", PRIMARY_KEY),
+        "user_roles by role_id (GET /roles/{id}/users)": (
+            select(user_roles.user_id).filter(user_roles.role_id == 1), "user_roles", "ix_user_roles_role_id_user_id"),
+        "role_permissions by role_id (GET /roles/{id}/permissions)": (
+            select(role_permissions.permission_id).filter(role_permissions.role_id == 1), "role_permissions", PRIMARY_KEY),
+        "role_permissions by permission_id (DELETE /permissions/{id})": (
+            select(role_permissions.role_id).filter(role_permissions.permission_id == 1), "role_permissions",
+            "ix_role_permissions_permission_id_role_id"),
+    }
+
+
+def index_name(dialect_name: str, table: str, index: str | None) -> str:
+    if index is not PRIMARY_KEY:
+        return index
+    return f"{table}_pkey" if dialect_name == "postgresql" else f"sqlite_autoindex_{table}_1"
+
+
+def uses_index(dialect_name: str, rows, index: str) -> bool:
+    """Whether the plan reads the given index."""
+    if dialect_name == "postgresql":
+        plan = rows[0][0]
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        nodes = [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node.get("Index Name") == index:
+                return True
+            nodes.extend(node.get("Plans", []))
+        return False
+    return any(re.search(rf"\bINDEX {re.escape(index)}\b", row[-1]) for row in rows)
+
+
+def full_scans(dialect_name: str, rows, partitions: dict) -> list:
+    """Full scans of tenant tables in the plan, plus scans of more than one partition of a partitioned one."""
+    if dialect_name == "postgresql":
+        plan = rows[0][0]
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        nodes, scans, scanned_partitions = [plan[0]["Plan"]], [], {}
+        while nodes:
+            node = nodes.pop()
+            relation = node.get("Relation Name")
+            if node["Node Type"] == "Seq Scan" and relation in TENANT_TABLES:
+                scans.append(f"Seq Scan on {relation}")
+            if relation in partitions:
+                scanned_partitions.setdefault(partitions[relation], set()).add(relation)
+            nodes.extend(node.get("Plans", []))
+        for table, scanned in scanned_partitions.items():
+            if len(scanned) > 1:
+                scans.append(f"{len(scanned)} partitions of {table} scanned")
+        return scans
+    scans = []
+    for row in rows:
+        match = SQLITE_FULL_SCAN.match(row[-1])
+        if match and match.group("table") in TENANT_TABLES:
+            scans.append(row[-1])
+    return scans
+
+
+async def seed(tenants: int, items_per_tenant: int, users_per_tenant: int):
+    now = datetime.now(timezone.utc)
+    async with SessionLocal() as db:
+        role_ids = list(await db.scalars(select(models.Role.id).order_by(models.Role.id)))
+        for tenant in range(tenants):
+            organization_id = f"{ORGANIZATION_PREFIX}{tenant}"
+            if await db.get(models.Organization, organization_id) is None:
+                await db.execute(insert(models.Organization).values(id=organization_id, name=organization_id, slug=organization_id))
+
+            existing = await db.scalar(select(func.count()).select_from(models.Item).filter(models.Item.organization_id == organization_id))
+            for start in range(existing, items_per_tenant, BATCH_SIZE):
+                rows = []
+                for _ in range(start, min(start + BATCH_SIZE, items_per_tenant)):
+                    created_at = now - timedelta(seconds=random.randrange(365 * 24 * 3600))
+                    rows.append({"name": f"item {random.randrange(1_000_000)}", "description": None, "price": round(random.uniform(1, 1000), 2),
+                                 "organization_id": organization_id, "created_at": created_at, "updated_at": created_at})
+                await bulk_insert(db, models.Item.__table__, ["name", "description", "price", "organization_id", "created_at", "updated_at"], rows)
+
+            existing = await db.scalar(select(func.count()).select_from(models.User).filter(models.User.organization_id == organization_id))
+            rows = [{"username": f"user{index}", "organization_id": organization_id, "password": "!", "is_active": True, "is_platform_admin": False}
+                    for index in range(existing, users_per_tenant)]
+            for start in range(0, len(rows), BATCH_SIZE):
+                await bulk_insert(db, models.User.__table__, ["username", "organization_id", "password", "is_active", "is_platform_admin"], rows[start:start + BATCH_SIZE])
+            if role_ids:
+                # One role per user that has none yet, so the association tables are not trivially small
+                users_without_roles = select(models.User.id, literal(role_ids[tenant % len(role_ids)])).filter(
+                    models.User.organization_id == organization_id,
+                    models.User.id.not_in(select(models.user_roles.c.user_id)))
+                await db.execute(insert(models.user_roles).from_select(["user_id", "role_id"], users_without_roles))
+            await db.commit()
+        await db.execute(text("ANALYZE"))
+        await db.commit()
+
+
+async def main(seed_data: bool, tenants: int, items_per_tenant: int, users_per_tenant: int):
+    if seed_data:
+        print(f"Seeding {tenants} tenants with {items_per_tenant} items and {users_per_tenant} users each...")
+        await seed(tenants, items_per_tenant, users_per_tenant)
+
+    failures = 0
+    async with SessionLocal() as db:
+        dialect_name = db.get_bind().dialect.name
+        organization_id = await db.scalar(select(models.Item.organization_id).filter(models.Item.organization_id.is_not(None)).limit(1))
+        partitions = {}
+        if dialect_name == "postgresql":
+            # Partition -> partitioned table, for the pruning check
+            partitions = dict((await db.execute(text(
+                "SELECT child.relname, parent.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid JOIN pg_class parent ON parent.oid = pg_inherits.inhparent"))).all())
+    principal = security.TokenPrincipal(id=0, username="plan_check", organization_id=organization_id, is_platform_admin=False, permission_mask=0)
+
+    configured_mode = settings.TENANT_ISOLATION
+    for mode in ("filter", "rls"):
+        if mode == "rls":
+            try:
+                await verify_rls(engine)
+            except RuntimeError as e:
+                print(f"skip TENANT_ISOLATION=rls: {e}")
+                continue
+        settings.TENANT_ISOLATION = mode
+        print(f"TENANT_ISOLATION={mode}")
+        async with SessionLocal() as db:
+            # In rls mode the builders leave out the tenant clause and the bound session supplies it, as in a request
+            await bind_tenant(db, principal)
+            for label, statement in tenant_queries(dialect_name, principal).items():
+                scans = full_scans(dialect_name, (await db.execute(Explain(statement))).all(), partitions)
+                failures += bool(scans)
+                print(f"{'FAIL' if scans else 'ok  '} {label}" + (f": {', '.join(scans)}" if scans else ""))
+            await db.rollback()
+    settings.TENANT_ISOLATION = configured_mode
+
+    index_failures = 0
+    async with SessionLocal() as db:
+        if dialect_name == "postgresql":
+            # These tables stay small next to items and users, where a seq scan wins; check the index can serve the lookup
+            await db.execute(text("SET LOCAL enable_seqscan = off"))
+        for label, (statement, table, index) in association_lookups().items():
+            index = index_name(dialect_name, table, index)
+            used = uses_index(dialect_name, (await db.execute(Explain(statement))).all(), index)
+            index_failures += not used
+            print(f"{'ok  ' if used else 'FAIL'} {label}" + ("" if used else f": {index} not used"))
+        await db.rollback()
+    await engine.dispose()
+
+    print(f"{failures} tenant-scoped queries fall back to a full scan")
+    print(f"{index_failures} association table lookups miss their index")
+    return 1 if failures or index_failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if a tenant-scoped query plans a full table scan or an association lookup misses its index")
+    parser.add_argument("--seed", action="store_true", help="Fill the database with tenants before checking")
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--items", type=int, default=50000, help="Items per tenant when seeding")
+    parser.add_argument("--users", type=int, default=2000, help="Users per tenant when seeding")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args.seed, args.tenants, args.items, args.users)))
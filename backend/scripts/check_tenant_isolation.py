@@ -0,0 +1,125 @@
+"""
+Isolation check for TENANT_ISOLATION=rls.
+
+Creates two organizations with an item and a user each, binds a session to one of them the way the auth
+dependencies do, and exits non-zero if that session can see, change or create rows of the other one.
+Runs against DATABASE_URL, which must be Postgres with `alembic upgrade head` applied, or with --temporary
+against a throwaway local server started through testing.postgresql (`pip install testing.postgresql`;
+needs the Postgres server binaries on PATH, not Docker):
+
+    python3 scripts/check_tenant_isolation.py --temporary
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import DBAPIError
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+ORGANIZATIONS = ("isolation_a", "isolation_b")
+
+
+async def run_checks(create_schema: bool):
+    # Imported here so --temporary can point DATABASE_URL at the throwaway server first
+    from src import models, security
+    from src.database import Base, SessionLocal, engine
+    from src.tenancy import bind_tenant, verify_rls
+
+    if create_schema:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+    await verify_rls(engine)
+
+    failures = 0
+    def check(label: str, passed: bool):
+        nonlocal failures
+        failures += not passed
+        print(f"{'ok  ' if passed else 'FAIL'} {label}")
+
+    async def cleanup(db):
+        await db.execute(delete(models.Item).filter(models.Item.organization_id.in_(ORGANIZATIONS)))
+        await db.execute(delete(models.User).filter(models.User.organization_id.in_(ORGANIZATIONS)))
+        await db.execute(delete(models.Organization).filter(models.Organization.id.in_(ORGANIZATIONS)))
+        await db.commit()
+
+    # Seed both tenants through an unbound (owner) session
+    own_org, other_org = ORGANIZATIONS
+    async with SessionLocal() as db:
+        await cleanup(db)
+        item_ids, user_ids = {}, {}
+        for organization_id in ORGANIZATIONS:
+            await db.execute(insert(models.Organization).values(id=organization_id, name=organization_id, slug=organization_id))
+            item_ids[organization_id] = await db.scalar(insert(models.Item).values(
+                name=f"{organization_id} item", price=1, organization_id=organization_id).returning(models.Item.id))
+            user_ids[organization_id] = await db.scalar(insert(models.User).values(
+                username=f"{organization_id} user", organization_id=organization_id, password="!", is_active=True,
+                is_platform_admin=False).returning(models.User.id))
+        await db.commit()
+
+    principal = security.TokenPrincipal(id=user_ids[own_org], username=f"{own_org} user", organization_id=own_org,
+                                        is_platform_admin=False, permission_mask=0)
+    try:
+        async with SessionLocal() as db:
+            # Bound mid-transaction, as get_current_user does after looking the caller up
+            await db.scalar(select(models.Organization.id).limit(1))
+            await bind_tenant(db, principal)
+
+            item_organizations = set(await db.scalars(select(models.Item.organization_id)))
+            check("items: only the bound organization is visible", item_organizations == {own_org})
+            check("items: another tenant's item is not found by id",
+                  await db.scalar(select(models.Item).filter(models.Item.id == item_ids[other_org])) is None)
+            updated = await db.execute(update(models.Item).filter(models.Item.id == item_ids[other_org]).values(name="changed"))
+            check("items: another tenant's item can not be updated", updated.rowcount == 0)
+            deleted = await db.execute(delete(models.Item).filter(models.Item.id == item_ids[other_org]))
+            check("items: another tenant's item can not be deleted", deleted.rowcount == 0)
+            user_organizations = set(await db.scalars(select(models.User.organization_id)))
+            check("users: only the bound organization is visible", user_organizations == {own_org})
+            await db.commit()
+
+            # The next transaction on the same session is scoped again
+            check("scope survives a commit",
+                  await db.scalar(select(models.Item).filter(models.Item.id == item_ids[other_org])) is None)
+            try:
+                await db.execute(insert(models.Item).values(name="smuggled", price=1, organization_id=other_org))
+                check("items: can not insert into another tenant", False)
+            except DBAPIError:
+                check("items: can not insert into another tenant", True)
+            await db.rollback()
+
+        async with SessionLocal() as db:
+            await bind_tenant(db, security.TokenPrincipal(id=0, username="platform", organization_id=None,
+                                                          is_platform_admin=True, permission_mask=0))
+            item_organizations = set(await db.scalars(select(models.Item.organization_id).filter(models.Item.organization_id.in_(ORGANIZATIONS))))
+            check("platform admins see every tenant", item_organizations == set(ORGANIZATIONS))
+    finally:
+        async with SessionLocal() as db:
+            await cleanup(db)
+        await engine.dispose()
+
+    print(f"{failures} isolation checks failed")
+    return 1 if failures else 0
+
+
+def main(temporary: bool):
+    os.environ["TENANT_ISOLATION"] = "rls"
+    if not temporary:
+        return asyncio.run(run_checks(create_schema=False))
+    try:
+        import testing.postgresql
+    except ImportError:
+        sys.exit("--temporary needs testing.postgresql: pip install testing.postgresql")
+    with testing.postgresql.Postgresql() as postgresql:
+        os.environ["DATABASE_URL"] = postgresql.url()
+        return asyncio.run(run_checks(create_schema=True))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if a tenant-bound session can reach another tenant's rows")
+    parser.add_argument("--temporary", action="store_true", help="Run against a throwaway local Postgres (testing.postgresql)")
+    args = parser.parse_args()
+
+    sys.exit(main(args.temporary))
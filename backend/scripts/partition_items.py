@@ -0,0 +1,139 @@
+"""
+Online move of items into the hash-partitioned layout (partitions of organization_id) added by migration 99a54bed95ed.
+
+The migration creates items_partitioned and a trigger that mirrors every write on items into it. This tool:
+
+  --backfill  copies the existing rows in id batches, each in its own short transaction that locks only the
+              batch's rows, so the API keeps serving reads and writes (--resume-from picks up after an interruption)
+  --verify    compares per-tenant row counts of both tables in one snapshot, without locking
+  --swap      verifies, then in one transaction under a short exclusive lock drops the trigger, renames items to
+              items_unpartitioned and items_partitioned to items, and moves the indexes' and sequence's names over
+
+    python3 scripts/partition_items.py --backfill --batch-size 50000
+    python3 scripts/partition_items.py --swap
+
+The old table is kept as items_unpartitioned; drop it by hand once the partitioned table has been checked.
+Measure per-tenant latency with scripts/benchmark_item_search.py before the backfill and after the swap.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from sqlalchemy import text
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src.database import SessionLocal, engine
+
+PARTITIONED_SUFFIX = "_partitioned"
+UNPARTITIONED_SUFFIX = "_unpartitioned"
+
+
+async def table_exists(db, table: str) -> bool:
+    return await db.scalar(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": table})
+
+
+async def backfill(batch_size: int, resume_from: int, pause: float):
+    async with SessionLocal() as db:
+        last_id = await db.scalar(text("SELECT max(id) FROM items")) or 0
+    # Rows past last_id are written after the trigger was installed, so the trigger has already copied them
+    print(f"Backfilling items {resume_from + 1}..{last_id} in batches of {batch_size}")
+    started = time.perf_counter()
+    for start in range(resume_from, last_id, batch_size):
+        end = min(start + batch_size, last_id)
+        async with SessionLocal() as db:
+            # Lock the batch so concurrent updates wait instead of racing the copy, then replace whatever
+            # the trigger mirrored in this range with the current rows
+            batch = {"start": start, "end": end}
+            await db.execute(text("SELECT id FROM items WHERE id > :start AND id <= :end FOR UPDATE"), batch)
+            await db.execute(text("DELETE FROM items_partitioned WHERE id > :start AND id <= :end"), batch)
+            copied = (await db.execute(text("INSERT INTO items_partitioned SELECT * FROM items WHERE id > :start AND id <= :end"), batch)).rowcount
+            await db.commit()
+        elapsed = time.perf_counter() - started
+        print(f"  up to id {end}: {copied} rows copied ({(end - resume_from) / elapsed:,.0f} ids/s)")
+        if pause:
+            await asyncio.sleep(pause)
+
+
+async def verify() -> bool:
+    async with SessionLocal() as db:
+        # Trigger writes commit together with the write on items, so one snapshot sees both tables in step
+        await db.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"))
+        source = dict((await db.execute(text("SELECT organization_id, count(*) FROM items GROUP BY organization_id"))).all())
+        target = dict((await db.execute(text("SELECT organization_id, count(*) FROM items_partitioned GROUP BY organization_id"))).all())
+        await db.rollback()
+    mismatched = {organization_id for organization_id in source.keys() | target.keys() if source.get(organization_id, 0) != target.get(organization_id, 0)}
+    for organization_id in sorted(mismatched, key=str):
+        print(f"  {organization_id}: items {source.get(organization_id, 0)}, items_partitioned {target.get(organization_id, 0)}")
+    print(f"{len(source)} tenants, {sum(source.values())} rows, {len(mismatched)} tenants out of step")
+    return not mismatched
+
+
+async def swap(lock_timeout: str):
+    async with SessionLocal() as db:
+        await db.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+        await db.execute(text("LOCK TABLE items IN ACCESS EXCLUSIVE MODE"))
+        await db.execute(text("DROP TRIGGER items_partitioned_sync ON items"))
+        await db.execute(text("DROP FUNCTION items_partitioned_sync()"))
+        await db.execute(text(f"ALTER TABLE items RENAME TO items{UNPARTITIONED_SUFFIX}"))
+
+        # Free the models' index names on the old table, then give them to the partitioned table's indexes
+        old_indexes = await db.scalars(text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table"),
+                                       {"table": f"items{UNPARTITIONED_SUFFIX}"})
+        for index in old_indexes.all():
+            await db.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index}{UNPARTITIONED_SUFFIX}"'))
+        new_indexes = await db.scalars(text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table"),
+                                       {"table": f"items{PARTITIONED_SUFFIX}"})
+        for index in new_indexes.all():
+            if index.endswith(PARTITIONED_SUFFIX):
+                await db.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index.removesuffix(PARTITIONED_SUFFIX)}"'))
+
+        await db.execute(text(f"ALTER TABLE items{PARTITIONED_SUFFIX} RENAME TO items"))
+        await db.execute(text("ALTER SEQUENCE items_id_seq OWNED BY items.id"))
+        await db.commit()
+    async with SessionLocal() as db:
+        await db.execute(text("ANALYZE items"))
+        await db.commit()
+    print(f"items is now hash-partitioned by organization_id; the old table is items{UNPARTITIONED_SUFFIX}")
+
+
+async def main(run_backfill: bool, run_verify: bool, run_swap: bool, batch_size: int, resume_from: int, pause: float, lock_timeout: str):
+    try:
+        if engine.dialect.name != "postgresql":
+            print("Partitioned items are Postgres only")
+            return 1
+        async with SessionLocal() as db:
+            if not await table_exists(db, "items_partitioned"):
+                print("items_partitioned does not exist: run `alembic upgrade head` first, or items has already been swapped")
+                return 1
+
+        if run_backfill:
+            await backfill(batch_size, resume_from, pause)
+        if run_verify or run_swap:
+            if not await verify():
+                print("Tables are out of step; run --backfill (again) before swapping")
+                return 1
+        if run_swap:
+            await swap(lock_timeout)
+        return 0
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move items into the hash-partitioned layout without downtime")
+    parser.add_argument("--backfill", action="store_true", help="Copy existing rows into items_partitioned in batches")
+    parser.add_argument("--verify", action="store_true", help="Compare per-tenant row counts of both tables")
+    parser.add_argument("--swap", action="store_true", help="Verify, then make items_partitioned the items table")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Item ids per backfill transaction")
+    parser.add_argument("--resume-from", type=int, default=0, help="Skip item ids up to and including this one")
+    parser.add_argument("--pause", type=float, default=0, help="Seconds to sleep between batches to limit load")
+    parser.add_argument("--lock-timeout", default="5s", help="Give up the swap instead of queueing behind long transactions")
+    args = parser.parse_args()
+    if not (args.backfill or args.verify or args.swap):
+        parser.error("nothing to do: pass --backfill, --verify and/or --swap")
+
+    sys.exit(asyncio.run(main(args.backfill, args.verify, args.swap, args.batch_size, args.resume_from, args.pause, args.lock_timeout)))
@@ -0,0 +1,33 @@
+"""
+Deletes every expired refresh token.
+
+Logging in and rotating a refresh token already drop the expired tokens of that user; this covers users who stopped
+logging in, whose tokens would otherwise stay in the table for good. Safe to run from cron at any time:
+
+    python3 scripts/purge_refresh_tokens.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(project_root))
+
+from src.database import SessionLocal, engine
+from src.security import purge_expired_refresh_tokens
+
+
+async def main():
+    async with SessionLocal() as db:
+        purged = await purge_expired_refresh_tokens(db)
+        await db.commit()
+    await engine.dispose()
+    print(f"{purged} expired refresh tokens deleted")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete expired refresh tokens")
+    parser.parse_args()
+
+    asyncio.run(main())
@@ -1,7 +1,7 @@
 import os
 import sys
 from datetime import datetime, timezone
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert
 from sqlalchemy.orm import sessionmaker, Session
 from datetime import datetime, timezone
 
@@ -10,6 +10,7 @@ sys.path.insert(0, os.path.join(project_root))
 
 from src.database import Base
 from src import models, schemas, utils
+from src.permissions import effective_permissions_source_query
 from src.config import settings
 
 DATABASE_URL = settings.DATABASE_URL
@@ -284,6 +285,10 @@ def seed_data():
         viewer_user2.roles.append(viewer_role)
         db.commit()
 
+        # --- Build effective permissions ---
+        db.execute(insert(models.user_effective_permissions).from_select(["user_id", "permission_id"], effective_permissions_source_query()))
+        db.commit()
+
         # --- Create items ---
         item1 = models.Item(name="Item X", description="Ex Eggs", price=75, organization_id=org1_id)
         item2 = models.Item(name="Item Y", description="Why Wai", price=100, organization_id=org2_id)
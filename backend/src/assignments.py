@@ -0,0 +1,50 @@
+from typing import List
+from sqlalchemy import Table, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.cache import TTLCache
+from src.config import settings
+from src.search import escape_like
+
+MAX_MATRIX_LIMIT = 100
+
+# (id, name, description) of every role / permission a caller can see, keyed by (table name, include platform-level rows).
+# Roles and permissions are shared by all organizations, so the only per-caller difference is platform-level visibility
+assignment_catalog_cache = TTLCache(maxsize=8, ttl=settings.ASSIGNMENT_CATALOG_TTL_SECONDS)
+
+def invalidate_assignment_catalog(model):
+    assignment_catalog_cache.invalidate_where(lambda key, catalog: key[0] == model.__tablename__)
+
+def visible_targets_filter(model, include_platform_level: bool):
+    return True if include_platform_level else model.is_platform_level == False
+
+async def get_assignment_catalog(db: AsyncSession, model, include_platform_level: bool) -> List[tuple]:
+    key = (model.__tablename__, include_platform_level)
+    catalog = assignment_catalog_cache.get(key)
+    if catalog is None:
+        catalog_query = select(model.id, model.name, model.description).filter(visible_targets_filter(model, include_platform_level)).order_by(model.id)
+        catalog = [tuple(row) for row in await db.execute(catalog_query)]
+        assignment_catalog_cache.set(key, catalog)
+    return catalog
+
+async def assignment_matrix(db: AsyncSession, model, table: Table, owner_column: str, owner_id: int, target_column: str,
+                            include_platform_level: bool, name: str | None = None, skip: int = 0, limit: int | None = None):
+    """
+    Every visible role / permission as {"name", "description", "id", "assigned"} for one user / role.
+
+    The full, unfiltered list is the cached catalog plus one lookup of the assigned ids; a name filter or a page
+    is answered by a single LEFT JOIN of the catalog against the association table. The rows carry exactly the
+    fields of schemas.RoleWithAssignment / PermissionWithAssignment, so they can be sent as a FastJSONResponse.
+    """
+    if name is None and limit is None and not skip:
+        assigned_ids = set(await db.scalars(select(table.c[target_column]).filter(table.c[owner_column] == owner_id)))
+        catalog = await get_assignment_catalog(db, model, include_platform_level)
+        return [{"name": target_name, "description": description, "id": target_id, "assigned": target_id in assigned_ids}
+                for target_id, target_name, description in catalog]
+
+    matrix_query = select(model.name, model.description, model.id, table.c[owner_column].is_not(None).label("assigned")).outerjoin(
+        table, and_(table.c[target_column] == model.id, table.c[owner_column] == owner_id)).filter(
+        visible_targets_filter(model, include_platform_level))
+    if name:
+        matrix_query = matrix_query.filter(model.name.ilike(f"%{escape_like(name)}%", escape="\\"))
+    matrix_query = matrix_query.order_by(model.id).offset(skip).limit(limit)
+    return [row._asdict() for row in await db.execute(matrix_query)]
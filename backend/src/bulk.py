@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, List, Literal
+import asyncpg
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, Table, insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database import SessionLocal
+from src.tenancy import bind_tenant
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a streamed request body into lines without buffering the whole body; decoding is left to the caller."""
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if buffer:
+        yield buffer.rstrip(b"\r")
+
+async def iter_records(stream: AsyncIterator[bytes], content_type: str) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Yield (row_number, record, parse_error) for each non-empty row of an NDJSON or CSV body.
+
+    CSV bodies start with a header row naming the columns; quoted fields may not span lines.
+    Rows that are not valid UTF-8 are reported like any other unparseable row.
+    """
+    is_csv = content_type.startswith("text/csv")
+    header = None
+    row_number = 0
+    async for raw_line in iter_lines(stream):
+        decode_error = None
+        try:
+            line = raw_line.decode("utf-8")
+        except UnicodeDecodeError as e:
+            line = raw_line.decode("utf-8", errors="replace")
+            decode_error = f"Invalid UTF-8 at byte {e.start}"
+        if not line.strip():
+            continue
+        if is_csv and header is None:
+            header = next(csv.reader([line]))
+            continue
+        row_number += 1
+        if decode_error:
+            yield row_number, None, decode_error
+            continue
+        try:
+            if is_csv:
+                values = next(csv.reader([line]))
+                record = {column: value or None for column, value in zip(header, values)}
+            else:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Row must be a JSON object")
+        except ValueError as e:
+            yield row_number, None, str(e)
+            continue
+        yield row_number, record, None
+
+class BulkInsertError(Exception):
+    """The database refused a batch; the session must be rolled back before it is used again."""
+
+async def bulk_insert(db: AsyncSession, table: Table, columns: List[str], rows: List[dict]):
+    """
+    Insert rows with COPY on Postgres (asyncpg) and a single executemany INSERT elsewhere.
+
+    Raises BulkInsertError with the database's message when any row is refused; nothing of the batch is inserted.
+    """
+    if not rows:
+        return
+    connection = await db.connection()
+    try:
+        # Postgres refuses COPY FROM into tables with row-level security, so tenant-bound sessions INSERT instead
+        if connection.dialect.driver == "asyncpg" and "tenant" not in db.info:
+            raw_connection = await connection.get_raw_connection()
+            await raw_connection.driver_connection.copy_records_to_table(
+                table.name, records=[tuple(row[column] for column in columns) for row in rows], columns=columns)
+        else:
+            await db.execute(insert(table), rows)
+    except DBAPIError as e:
+        raise BulkInsertError(str(e.orig).splitlines()[0]) from e
+    except asyncpg.PostgresError as e:
+        # COPY runs on the driver connection, so its errors are not wrapped by SQLAlchemy
+        raise BulkInsertError(str(e).splitlines()[0]) from e
+
+
+# === Export ===
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+async def iter_export(query: Select, export_format: Literal["ndjson", "csv"], current_user=None) -> AsyncIterator[str]:
+    """
+    Serialize the rows of a column select one at a time, fetching them through a server-side cursor.
+
+    Uses its own session, scoped to `current_user`'s organization: the request's session is closed
+    before a StreamingResponse body is sent.
+    """
+    async with SessionLocal() as db:
+        if current_user is not None:
+            await bind_tenant(db, current_user)
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            async for row in result:
+                writer.writerow(row)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            async for row in result:
+                yield json.dumps(dict(zip(columns, row)), default=_json_default) + "\n"
+
+def export_response(query: Select, export_format: Literal["ndjson", "csv"], filename: str, current_user=None):
+    return StreamingResponse(
+        iter_export(query, export_format, current_user),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -7,6 +8,49 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: str
     FRONTEND_URL: str
 
+    # Connection pool (per worker process). DB_POOL_RECYCLE is in seconds (-1 disables), DB_STATEMENT_TIMEOUT_MS=0 disables
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+
+    # In-process cache of authenticated principals (see security.get_current_user)
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+
+    # Worker pool for bcrypt hashing/verification (executor is "thread" or "process")
+    PASSWORD_HASHING_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASHING_WORKERS: int = 4
+    PASSWORD_HASHING_MAX_CONCURRENCY: int = 8
+
+    # Lifetime of the opaque refresh tokens exchanged at POST /auth/refresh
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+
+    # Verified JWT claims cached per token (bounded by each token's exp) and the library used to sign/verify them
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+    JWT_BACKEND: Literal["jose", "pyjwt"] = "jose"
+
+    # Let get_token_principal trust signed token claims on read endpoints instead of looking the user up.
+    # Token revocations are held per worker, so only enable this with a single worker process.
+    STATELESS_AUTH: bool = False
+
+    # How tenant-scoped queries are isolated: explicit organization_id filters, or Postgres row-level security (see src/tenancy.py)
+    TENANT_ISOLATION: Literal["filter", "rls"] = "filter"
+
+    # Serve the item list and role / permission assignment lists as plain rows encoded by orjson, skipping response_model validation
+    FAST_JSON_RESPONSES: bool = True
+
+    # Upper bound on user ids accepted by POST /roles/{role_id}/members:batch
+    ROLE_MEMBERS_BATCH_MAX: int = 10000
+
+    # In-process cache of the role / permission lists behind the assignment screens (see src/assignments.py)
+    ASSIGNMENT_CATALOG_TTL_SECONDS: int = 300
+
+    # How long a worker trusts its permission name -> bit map before reloading it (see PermissionCatalog)
+    PERMISSION_CATALOG_TTL_SECONDS: int = 60
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore") # Load from .env
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,53 @@
+from fastapi import HTTPException, status
+from sqlalchemy import delete, update, select, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List
+
+def update_returning_query(model, values: dict, *criteria):
+    return update(model).filter(*criteria).values(**values).returning(model)
+
+def delete_returning_query(model, *criteria, returning: tuple = ()):
+    return delete(model).filter(*criteria).returning(model.id, *returning)
+
+async def update_or_404(db: AsyncSession, model, values: dict, *criteria, detail: str):
+    """UPDATE ... RETURNING in a single round trip; 404 when no row matches the criteria."""
+    update_query = update_returning_query(model, values, *criteria)
+    updated = await db.scalar(update_query.execution_options(populate_existing=True))
+    if updated is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+    return updated
+
+async def delete_or_404(db: AsyncSession, model, *criteria, detail: str, returning: tuple = ()):
+    """DELETE ... RETURNING id (plus any `returning` columns) in a single round trip; 404 when nothing was deleted."""
+    delete_query = delete_returning_query(model, *criteria, returning=returning)
+    deleted = (await db.execute(delete_query.execution_options(synchronize_session=False))).first()
+    if deleted is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+    return deleted
+
+def insert_ignore(db: AsyncSession, table):
+    """INSERT ... ON CONFLICT DO NOTHING for the session's dialect."""
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    return dialect_insert(table).on_conflict_do_nothing()
+
+async def add_associations(db: AsyncSession, table, owner_column: str, owner_id, target_column: str, target_model, target_ids: Iterable[int]) -> List[int]:
+    """Link owner_id to the existing target_ids in one INSERT ... SELECT ... ON CONFLICT DO NOTHING; returns the newly linked ids."""
+    target_ids = set(target_ids)
+    if not target_ids:
+        return []
+    source_query = select(literal(owner_id), target_model.id).filter(target_model.id.in_(target_ids))
+    insert_query = insert_ignore(db, table).from_select([owner_column, target_column], source_query)
+    return sorted(await db.scalars(insert_query.returning(table.c[target_column])))
+
+async def remove_associations(db: AsyncSession, table, owner_column: str, owner_id, target_column: str, target_ids: Iterable[int] | None = None, keep_ids: Iterable[int] | None = None) -> List[int]:
+    """Unlink owner_id from target_ids (or from everything not in keep_ids) in one DELETE; returns the unlinked ids."""
+    delete_query = delete(table).filter(table.c[owner_column] == owner_id)
+    if target_ids is not None:
+        target_ids = set(target_ids)
+        if not target_ids:
+            return []
+        delete_query = delete_query.filter(table.c[target_column].in_(target_ids))
+    if keep_ids is not None:
+        delete_query = delete_query.filter(table.c[target_column].not_in(set(keep_ids)))
+    return sorted(await db.scalars(delete_query.returning(table.c[target_column])))
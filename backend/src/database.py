@@ -1,18 +1,46 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 from src.config import settings
+from src.metrics import TimedQueuePool, instrument_engine
+from src.tenancy import TenantSession
 
-engine = create_engine(settings.DATABASE_URL)
+# Async drivers for the configured database backend (Postgres in production, SQLite for tests)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_async_database_url(database_url: str):
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver:
+        url = url.set(drivername=driver)
+    return url
+
+def get_engine_options(url):
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if url.get_backend_name() == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+    return options
+
+database_url = get_async_database_url(settings.DATABASE_URL)
+engine = create_async_engine(database_url, **get_engine_options(database_url))
+instrument_engine(engine)
+
+# expire_on_commit=False so returned objects can be serialized without lazy IO after commit;
+# TenantSession applies the organization bound by the auth dependencies in TENANT_ISOLATION=rls mode
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, sync_session_class=TenantSession,
+                                  autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,6 +1,8 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from src.database import engine, Base, get_db
-from src import schemas, models, security
+from src import schemas, models, security, utils, tenancy
+from src.metrics import MetricsMiddleware, pool_status, render_metrics
+from fastapi.responses import PlainTextResponse
 from src.config import settings
 from src.routers import auth, organization, user, role, permission, item
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
@@ -8,12 +10,22 @@ from sqlalchemy.orm import Session
 from typing import Annotated
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import timedelta
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if tenancy.rls_enabled():
+        await tenancy.verify_rls(engine)
+    yield
+    # Release the password hashing workers and pooled DB connections on shutdown
+    utils.password_pool.shutdown()
+    await engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Create tables on startup
 # Base.metadata.create_all(bind=engine)
@@ -26,7 +38,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Queries", "X-DB-Time-Ms", "X-DB-Pool-Wait-Ms"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # === Routers ===
 app.include_router(auth.router)
@@ -38,4 +52,27 @@ app.include_router(item.router)
 
 @app.get("/")
 async def root():
-    return {"message": "Hello World"}
\ No newline at end of file
+    return {"message": "Hello World"}
+
+@app.get("/metrics/db")
+async def db_metrics():
+    return pool_status(engine)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    pool = pool_status(engine)
+    samples = {
+        "db_pool_checked_out": ("gauge", "Connections currently checked out of the pool", pool.get("checked_out", 0)),
+        "db_pool_overflow": ("gauge", "Connections open beyond the pool size", pool.get("overflow", 0)),
+        "db_pool_checkouts_total": ("counter", "Connection checkouts", pool["checkouts"]),
+        "db_pool_wait_seconds_total": ("counter", "Time spent waiting for a pooled connection", pool["wait_seconds_total"]),
+        "db_queries_total": ("counter", "SQL statements executed", pool["queries"]),
+        "db_query_seconds_total": ("counter", "Time spent executing SQL", pool["db_seconds_total"]),
+        "principal_cache_hits_total": ("counter", "Principal cache hits", security.principal_cache.hits),
+        "principal_cache_misses_total": ("counter", "Principal cache misses", security.principal_cache.misses),
+        "token_cache_hits_total": ("counter", "Verified token cache hits", security.token_cache.hits),
+        "token_cache_misses_total": ("counter", "Verified token cache misses", security.token_cache.misses),
+        "password_hashing_running": ("gauge", "Password hashing jobs running", utils.password_pool.running),
+        "password_hashing_queued": ("gauge", "Password hashing jobs waiting for a worker", utils.password_pool.queued),
+    }
+    return render_metrics(samples)
@@ -0,0 +1,215 @@
+"""
+Request and database instrumentation, exposed as response headers and in Prometheus text format.
+
+Recording a request costs a few dict lookups and list increments; the middleware's overhead budget is
+25 µs per request (measure with scripts/benchmark_metrics.py).
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+@dataclass
+class RequestStats:
+    query_count: int = 0
+    db_time: float = 0.0
+    pool_checkouts: int = 0
+    pool_wait_time: float = 0.0
+    pool_wait_max: float = 0.0
+    auth_checks: int = 0
+    auth_time: float = 0.0
+
+    def record_pool_wait(self, wait: float):
+        self.pool_checkouts += 1
+        self.pool_wait_time += wait
+        self.pool_wait_max = max(self.pool_wait_max, wait)
+
+# Process-wide totals, and the stats of the request currently being handled (set by MetricsMiddleware)
+db_totals = RequestStats()
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+def record_auth_time(elapsed: float):
+    stats = request_stats.get()
+    if stats is not None:
+        stats.auth_checks += 1
+        stats.auth_time += elapsed
+
+
+# === Metric types ===
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(label_names: tuple, label_values: tuple) -> str:
+    if not label_names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in zip(label_names, label_values)) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names: tuple = ()):
+        self.name, self.help, self.label_names = name, help, label_names
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.label_names, labels)} {value}" for labels, value in self.values.items()]
+        return lines
+
+class Gauge(Counter):
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, labels: tuple, value: float):
+        self.values[labels] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names, self.buckets = name, help, label_names, buckets
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                bucket_labels = _format_labels(self.label_names + ("le",), labels + (bound,))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+REQUEST_LABELS = ("method", "route")
+requests_in_flight = Gauge("http_requests_in_flight", "Requests currently being handled")
+requests_total = Counter("http_requests_total", "Requests handled, by route template and status code", REQUEST_LABELS + ("status",))
+request_duration = Histogram("http_request_duration_seconds", "Request latency by route template", REQUEST_LABELS)
+request_auth_duration = Histogram("http_request_auth_seconds", "Time spent authenticating the request", REQUEST_LABELS)
+request_db_duration = Histogram("http_request_db_seconds", "Time spent executing SQL during the request", REQUEST_LABELS)
+request_metrics = (requests_in_flight, requests_total, request_duration, request_auth_duration, request_db_duration)
+
+
+# === Database instrumentation ===
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            db_totals.record_pool_wait(wait)
+            stats = request_stats.get()
+            if stats is not None:
+                stats.record_pool_wait(wait)
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Count queries and DB time, process-wide and for the current request."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        db_totals.query_count += 1
+        db_totals.db_time += elapsed
+        stats = request_stats.get()
+        if stats is not None:
+            stats.query_count += 1
+            stats.db_time += elapsed
+
+
+def pool_status(engine: AsyncEngine):
+    pool = engine.pool
+    status = {
+        "checkouts": db_totals.pool_checkouts,
+        "wait_seconds_total": db_totals.pool_wait_time,
+        "wait_seconds_max": db_totals.pool_wait_max,
+        "queries": db_totals.query_count,
+        "db_seconds_total": db_totals.db_time,
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow(), checked_in=pool.checkedin())
+    return status
+
+
+def render_metrics(samples: dict[str, tuple[str, str, float]]):
+    """Prometheus text exposition of the request metrics plus unlabeled samples ({name: (type, help, value)})."""
+    lines = []
+    for metric in request_metrics:
+        lines += metric.render()
+    for name, (type, help, value) in samples.items():
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {type}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status, auth time and DB time per route template.
+
+    Each request's query count, DB time and pool wait are also returned as X-DB-* response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status_code = 500
+        requests_in_flight.inc()
+
+        async def send_with_headers(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(stats.query_count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.db_time * 1000:.2f}".encode()))
+                headers.append((b"x-db-pool-wait-ms", f"{stats.pool_wait_time * 1000:.2f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            request_stats.reset(token)
+            requests_in_flight.dec()
+            # Label by route template (e.g. /items/{item_id}) so raw ids don't create new series
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched")
+            request_duration.observe(labels, time.perf_counter() - start)
+            requests_total.inc(labels + (status_code,))
+            request_db_duration.observe(labels, stats.db_time)
+            if stats.auth_checks:
+                request_auth_duration.observe(labels, stats.auth_time)
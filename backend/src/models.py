@@ -1,27 +1,40 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, DateTime, Table, Date, UniqueConstraint
-from sqlalchemy.sql.expression import text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, DateTime, Table, Date, UniqueConstraint, Index, DDL, event
+from sqlalchemy.sql import func
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from sqlalchemy.orm import relationship
 from src.database import Base
+from src.search import text_search_vector
+from src.tenancy import RLS_DDL
 
 # Association table for many-to-many User <-> Role
 user_roles = Table(
     "user_roles",
     Base.metadata,
-    Column("user_id", Integer, ForeignKey("users.id")),
-    Column("role_id", Integer, ForeignKey("roles.id")),
-    Column("created_at", TIMESTAMP(timezone=True), nullable=False, server_default=text('now()')),
-    Column("updated_at", TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), onupdate=text('now()'))
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("role_id", Integer, ForeignKey("roles.id"), primary_key=True),
+    Column("created_at", TIMESTAMP(timezone=True), nullable=False, server_default=func.now()),
+    Column("updated_at", TIMESTAMP(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()),
+    Index("ix_user_roles_role_id_user_id", "role_id", "user_id"), # Role -> users lookups
 )
 
 # Association table for many-to-many Role <-> Permission
 role_permissions = Table(
     "role_permissions",
     Base.metadata,
-    Column("role_id", Integer, ForeignKey("roles.id")),
-    Column("permission_id", Integer, ForeignKey("permissions.id")),
-    Column("created_at", TIMESTAMP(timezone=True), nullable=False, server_default=text('now()')),
-    Column("updated_at", TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), onupdate=text('now()'))
+    Column("role_id", Integer, ForeignKey("roles.id"), primary_key=True),
+    Column("permission_id", Integer, ForeignKey("permissions.id"), primary_key=True),
+    Column("created_at", TIMESTAMP(timezone=True), nullable=False, server_default=func.now()),
+    Column("updated_at", TIMESTAMP(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()),
+    Index("ix_role_permissions_permission_id_role_id", "permission_id", "role_id"), # Permission -> roles lookups
+)
+
+# Derived table: every (user, permission) pair granted through any role. Maintained by src.permissions
+user_effective_permissions = Table(
+    "user_effective_permissions",
+    Base.metadata,
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Column("permission_id", Integer, ForeignKey("permissions.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_user_effective_permissions_permission_id", "permission_id"),
 )
 
 class Organization(Base):
@@ -44,16 +57,27 @@ class User(Base):
     name = Column(String)
     is_active = Column(Boolean, default=True)
     is_platform_admin = Column(Boolean, default=False, nullable=False)
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), onupdate=text('now()'))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
     organization_id = Column(String, ForeignKey("organizations.id"), nullable=True)
     organization = relationship("Organization", back_populates="users")
     roles = relationship("Role", secondary=user_roles, back_populates="users")
 
     __table_args__ = (
         UniqueConstraint('organization_id', 'username', name='_organization_username_uc'),
+        Index('ix_users_organization_id_id', 'organization_id', 'id'), # Tenant-scoped keyset pagination
     )
 
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False) # SHA-256 of the opaque token; the token itself is never stored
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    revoked_at = Column(TIMESTAMP(timezone=True), nullable=True) # Set when rotated or revoked
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
 class Role(Base):
     __tablename__ = "roles"
 
@@ -61,8 +85,8 @@ class Role(Base):
     name = Column(String(50), unique=True)
     description = Column(String(100))
     is_platform_level = Column(Boolean, default=False, nullable=False)
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), onupdate=text('now()'))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
     users = relationship("User", secondary=user_roles, back_populates="roles")
     permissions = relationship("Permission", secondary=role_permissions, back_populates="roles")
 
@@ -73,11 +97,14 @@ class Permission(Base):
     name = Column(String(50), unique=True)  # e.g., "create:contact", "delete:user"
     is_platform_level = Column(Boolean, default=False, nullable=False)
     description = Column(String(100))
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), onupdate=text('now()'))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
     roles = relationship("Role", secondary=role_permissions, back_populates="permissions")
 
 
+# On Postgres items can be hash-partitioned by organization_id (migration 99a54bed95ed, then scripts/partition_items.py).
+# The ORM keeps id as the identity either way; the partitioned table's unique key is (organization_id, id), so
+# queries that filter on organization_id are pruned to a single partition
 class Item(Base):
     __tablename__ = "items"
 
@@ -85,8 +112,23 @@ class Item(Base):
     name = Column(String(50))
     description = Column(String(100))
     price = Column(Float)
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'), onupdate=text('now()'))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
     organization_id = Column(String, ForeignKey("organizations.id"), nullable=True)
     organization = relationship("Organization", back_populates="items")
-    
\ No newline at end of file
+
+    __table_args__ = (
+        Index('ix_items_organization_id_id', 'organization_id', 'id'), # Tenant-scoped keyset pagination
+        Index('ix_items_organization_id_price', 'organization_id', 'price'), # Tenant-scoped price filters and sorting
+        Index('ix_items_organization_id_created_at', 'organization_id', 'created_at', 'id'), # Tenant-scoped date filters and sorting
+        Index('ix_items_organization_id_name', 'organization_id', 'name', 'id'), # Tenant-scoped name sorting
+        # Name search (see src/search.py), Postgres only: trigram GIN for prefix ILIKE, tsvector GIN for full-text
+        Index('ix_items_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}).ddl_if(dialect="postgresql"),
+        Index('ix_items_name_tsv', text_search_vector(name), postgresql_using='gin').ddl_if(dialect="postgresql"),
+    )
+
+event.listen(Item.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
+# Row-level security policies for TENANT_ISOLATION=rls, once every table (and its grants) exists
+for statement in RLS_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="postgresql"))
@@ -0,0 +1,48 @@
+import base64
+import json
+from fastapi import HTTPException, status
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+def encode_cursor(last_id) -> str:
+    return base64.urlsafe_b64encode(json.dumps(last_id).encode()).rstrip(b"=").decode("ascii")
+
+def decode_cursor(cursor: str, expected_type: type):
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        last_id = None
+    if not isinstance(last_id, expected_type):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+    return last_id
+
+async def fetch_page(db: AsyncSession, query: Select, as_rows: bool):
+    if as_rows:
+        return [row._asdict() for row in await db.execute(query)]
+    return (await db.scalars(query)).all()
+
+def page_query(query: Select, id_column, skip: int, limit: int, cursor: str | None) -> Select:
+    """The statement paginate() runs for one page; keyset pages fetch one extra row to tell whether another follows."""
+    if cursor is None:
+        return query.offset(skip).limit(limit)
+    if cursor:
+        query = query.filter(id_column > decode_cursor(cursor, id_column.type.python_type))
+    return query.order_by(id_column).limit(limit + 1)
+
+async def paginate(db: AsyncSession, query: Select, id_column, skip: int, limit: int, cursor: str | None, as_rows: bool = False):
+    """
+    Offset pagination (a plain list) when no cursor is given, keyset pagination otherwise.
+
+    In keyset mode pass an empty cursor for the first page; the response is
+    {"items": [...], "next_cursor": ...} and next_cursor is None on the last page.
+    With as_rows, `query` selects columns and the page holds one dict per row instead of ORM objects.
+    """
+    rows = await fetch_page(db, page_query(query, id_column, skip, limit, cursor), as_rows)
+    if cursor is None:
+        return rows
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][id_column.key] if as_rows else getattr(rows[-1], id_column.key))
+    return {"items": rows, "next_cursor": next_cursor}
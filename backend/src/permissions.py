@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import time
+from typing import Iterable, List
+from sqlalchemy import Select, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src import models
+from src.config import settings
+from src.crud import insert_ignore
+
+def effective_permissions_source_query():
+    """(user_id, permission_id) pairs derived from user_roles and role_permissions."""
+    return select(models.user_roles.c.user_id, models.role_permissions.c.permission_id).distinct().join(
+        models.role_permissions, models.role_permissions.c.role_id == models.user_roles.c.role_id)
+
+async def resolve_effective_permissions(db: AsyncSession, user_id: int) -> List[str]:
+    """Permission names granted to a user, read from the user_effective_permissions table."""
+    permissions_query = select(models.Permission.name).join(
+        models.user_effective_permissions, models.user_effective_permissions.c.permission_id == models.Permission.id).filter(
+        models.user_effective_permissions.c.user_id == user_id)
+    return list((await db.scalars(permissions_query)).all())
+
+async def resolve_effective_permission_ids(db: AsyncSession, user_id: int) -> List[int]:
+    """Same as resolve_effective_permissions, returning permission ids from a single index lookup."""
+    permission_ids_query = select(models.user_effective_permissions.c.permission_id).filter(
+        models.user_effective_permissions.c.user_id == user_id)
+    return list((await db.scalars(permission_ids_query)).all())
+
+
+# === Effective permission maintenance ===
+# Call these inside the transaction that changes user_roles/role_permissions, after flushing the change
+
+async def refresh_effective_permissions(db: AsyncSession, user_ids: Iterable[int] | Select | None = None):
+    """Recompute user_effective_permissions for the given users (a list of ids or a select of ids), or for everyone."""
+    table = models.user_effective_permissions
+    delete_query = delete(table)
+    source_query = effective_permissions_source_query()
+    if user_ids is not None:
+        if not isinstance(user_ids, Select):
+            user_ids = list(user_ids)
+            if not user_ids:
+                return
+        delete_query = delete_query.filter(table.c.user_id.in_(user_ids))
+        source_query = source_query.filter(models.user_roles.c.user_id.in_(user_ids))
+    await db.execute(delete_query)
+    await db.execute(insert(table).from_select(["user_id", "permission_id"], source_query))
+
+async def refresh_role_members_effective_permissions(db: AsyncSession, role_id: int):
+    await refresh_effective_permissions(db, select(models.user_roles.c.user_id).filter(models.user_roles.c.role_id == role_id))
+
+async def grant_role_effective_permissions(db: AsyncSession, role_id: int, user_ids: Iterable[int]):
+    """Add a newly assigned role's permissions to its new members; granting a role can only add permissions."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    table = models.user_effective_permissions
+    source_query = select(models.user_roles.c.user_id, models.role_permissions.c.permission_id).join(
+        models.role_permissions, models.role_permissions.c.role_id == models.user_roles.c.role_id).filter(
+        models.user_roles.c.role_id == role_id, models.user_roles.c.user_id.in_(user_ids))
+    await db.execute(insert_ignore(db, table).from_select(["user_id", "permission_id"], source_query))
+
+async def remove_permission_from_effective_permissions(db: AsyncSession, permission_id: int):
+    await db.execute(delete(models.user_effective_permissions).filter(models.user_effective_permissions.c.permission_id == permission_id))
+
+async def check_effective_permissions(db: AsyncSession):
+    """Count rows that are missing from, or stale in, user_effective_permissions compared to the source tables."""
+    table = models.user_effective_permissions
+    stored_query = select(table.c.user_id, table.c.permission_id)
+    source_query = effective_permissions_source_query()
+    missing = await db.scalar(select(func.count()).select_from(source_query.except_(stored_query).subquery()))
+    stale = await db.scalar(select(func.count()).select_from(stored_query.except_(source_query).subquery()))
+    return {"missing": missing, "stale": stale}
+
+
+# === Permission bitmasks ===
+# A permission's bit position in a mask is its position in the PermissionCatalog the mask was built with
+
+def mask_for_bits(bits: Iterable[int]) -> int:
+    mask = 0
+    for bit in bits:
+        mask |= 1 << bit
+    return mask
+
+def encode_permission_mask(mask: int) -> str:
+    mask_bytes = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    return base64.urlsafe_b64encode(mask_bytes).rstrip(b"=").decode("ascii")
+
+def decode_permission_mask(encoded: str) -> int:
+    mask_bytes = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    return int.from_bytes(mask_bytes, "little")
+
+
+class PermissionCatalog:
+    """
+    In-process map of permission name -> bit position, versioned by a hash of its (id, name) pairs.
+
+    Bits are dense (a permission's position in id order), so a mask grows with the number of live permissions,
+    not with the largest id ever used. A bit is therefore only meaningful under the catalog version the mask was
+    built with: tokens carry that version (`pv`), and masks from any other version are recomputed from the
+    database instead of read (see security.resolve_current_user). A version this worker has not seen triggers
+    one reload, in case it is newer. Changes made on other workers are picked up once the catalog is older
+    than `ttl` seconds, so this worker neither stamps tokens with a stale version nor denies permissions it
+    has not loaded for longer than that.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version: str | None = None
+        self._bits: dict[str, int] = {}
+        self._id_bits: dict[int, int] = {}
+        self._names: List[str] = []
+        self._checked_versions: set[str] = set()
+        self._expires_at = 0.0
+
+    async def load(self, db: AsyncSession):
+        rows = (await db.execute(select(models.Permission.id, models.Permission.name).order_by(models.Permission.id))).all()
+        # The "dense" prefix keeps versions of id-indexed masks, issued before bits were dense, from ever matching
+        digest = hashlib.sha256(("dense;" + ";".join(f"{permission_id}:{name}" for permission_id, name in rows)).encode()).hexdigest()
+        self._bits = {name: bit for bit, (_, name) in enumerate(rows)}
+        self._id_bits = {permission_id: bit for bit, (permission_id, _) in enumerate(rows)}
+        self._names = [name for _, name in rows]
+        self._checked_versions = set()
+        self._expires_at = time.monotonic() + self.ttl
+        self.version = digest[:12]
+
+    def _expired(self) -> bool:
+        return self.version is None or time.monotonic() >= self._expires_at
+
+    async def ensure_loaded(self, db: AsyncSession, version: str | None = None):
+        if self._expired() or (version is not None and version != self.version and version not in self._checked_versions):
+            await self.load(db)
+            if version is not None and version != self.version:
+                # Token issued under an older catalog: remembered so its next requests do not reload again
+                self._checked_versions.add(version)
+
+    def invalidate(self):
+        self.version = None
+
+    def is_current(self, version: str | None) -> bool:
+        """Whether a mask issued under `version` can be read against this worker's catalog."""
+        return not self._expired() and version == self.version
+
+    def bit_for(self, name: str) -> int | None:
+        return self._bits.get(name)
+
+    def mask_for(self, names: Iterable[str]) -> int:
+        return mask_for_bits(self._bits[name] for name in names if name in self._bits)
+
+    async def mask_for_ids(self, db: AsyncSession, permission_ids: Iterable[int]) -> int:
+        """Mask of the given permission ids under the current version; reloads once for ids created since the last load."""
+        await self.ensure_loaded(db)
+        permission_ids = list(permission_ids)
+        if any(permission_id not in self._id_bits for permission_id in permission_ids):
+            await self.load(db)
+        return mask_for_bits(self._id_bits[permission_id] for permission_id in permission_ids if permission_id in self._id_bits)
+
+    def names_for(self, mask: int) -> List[str]:
+        return [name for bit, name in enumerate(self._names) if (mask >> bit) & 1]
+
+
+permission_catalog = PermissionCatalog(ttl=settings.PERMISSION_CATALOG_TTL_SECONDS)
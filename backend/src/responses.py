@@ -0,0 +1,15 @@
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded by orjson, for list endpoints that return plain rows instead of ORM objects.
+
+    Returning it skips the route's response_model validation, so the rows have to match that model already:
+    select exactly its fields (scripts/check_fast_responses.py compares both paths). OPT_UTC_Z writes UTC
+    datetimes with a "Z" suffix, as pydantic does.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
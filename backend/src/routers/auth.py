@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, status, HTTPException, Response
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated
 from src import schemas, models, security, utils
+from src.permissions import resolve_effective_permission_ids, permission_catalog, encode_permission_mask
 from src.database import get_db
 from datetime import timedelta
 from src.config import settings
 import os
+import uuid
 
 ACCESS_TOKEN_EXPIRE_MINUTES = int(settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
@@ -15,8 +18,34 @@ router = APIRouter(
     tags=['Auth']
 )
 
+async def issue_tokens(db: AsyncSession, user: models.User) -> schemas.Token:
+    # Get all unique permissions associated with the user's roles, encoded as a bitmask
+    permission_ids = await resolve_effective_permission_ids(db, user.id)
+    permission_mask = await permission_catalog.mask_for_ids(db, permission_ids)
+
+    # Add organization id to token
+    organization_id = None
+    if user.organization_id:
+        organization_id = user.organization_id
+
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    tokenData = {
+        "sub": user.username,
+        "pm": encode_permission_mask(permission_mask),
+        "pv": permission_catalog.version,
+        "organization_id": organization_id
+    }
+    if user.is_active:
+        # Claims for the stateless fast path (security.get_token_principal); ver is the issue time in ms
+        tokenData.update({"uid": user.id, "pa": user.is_platform_admin, "jti": uuid.uuid4().hex, "ver": security.token_version()})
+    access_token = security.create_access_token(data=tokenData, expires_delta=access_token_expires)
+    refresh_token = await security.create_refresh_token(db, user.id)
+    await db.commit()
+    return schemas.Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token)
+
+
 @router.post("/login")
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)) -> schemas.Token:
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)) -> schemas.Token:
     org_username = form_data.username.split('\\', 1) # Split on first backslash
 
     if len(org_username) != 2:
@@ -27,7 +56,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     
     org_slug, username = org_username[0].lower(), org_username[1].lower()
 
-    organization = db.query(models.Organization).filter(models.Organization.slug == org_slug).first()
+    organization = await db.scalar(select(models.Organization).filter(models.Organization.slug == org_slug))
     if not organization:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -35,51 +64,66 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(models.User).join(models.Organization).filter(
+    user = await db.scalar(select(models.User).join(models.Organization).filter(
         models.User.username == username,
         models.User.organization_id == organization.id
-    ).first()
+    ))
 
-    if not user or not utils.verify_password(form_data.password, user.password):
+    if not user or not await utils.verify_password_async(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Get all unique permissions associated with the user's roles
-    permissions = set()
-    for role in user.roles:
-        for permission in role.permissions:
-            permissions.add(permission.name)
-    user_permissions = list(permissions)
+    return await issue_tokens(db, user)
 
-    # Add organization id to token
-    organization_id = None
-    if user.organization:
-        organization_id = user.organization_id
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    tokenData = {
-        "sub": user.username,
-        "permissions": user_permissions,
-        "organization_id": organization_id
-    }
-    access_token = security.create_access_token(data=tokenData, expires_delta=access_token_expires)
-    return schemas.Token(access_token=access_token, token_type="bearer")
+# Exchange a refresh token for a new access token (with freshly resolved permissions) and a new refresh token
+@router.post("/refresh")
+async def refresh_access_token(request: schemas.RefreshTokenRequest, db: AsyncSession = Depends(get_db)) -> schemas.Token:
+    user_id = await security.rotate_refresh_token(db, request.refresh_token)
+    user = await db.scalar(select(models.User).filter(models.User.id == user_id)) if user_id is not None else None
+    if not user or not user.is_active:
+        if user:
+            await security.revoke_refresh_tokens(db, user.id)
+            await db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await issue_tokens(db, user)
 
 
 @router.get("/users/me/", response_model=schemas.CurrentUser)
-async def read_users_me(current_user: Annotated[schemas.UserPublic, Depends(security.get_current_active_user)],):
-    return current_user
+async def read_users_me(current_user: Annotated[schemas.CurrentUser, Depends(security.get_current_active_user)],):
+    # Expand the token's permission bitmask into names for the client
+    return current_user.model_copy(update={"permissions": permission_catalog.names_for(current_user.permission_mask)})
 
 
 @router.get("/users/me/organization", response_model=schemas.OrganizationPublic)
-async def read_users_me_organization(db: Session = Depends(get_db), current_user: schemas.UserPublic = Depends(security.get_current_active_user)):
-    user_org_query = db.query(models.Organization).join(models.User,
+async def read_users_me_organization(db: AsyncSession = Depends(get_db), current_user: schemas.UserPublic = Depends(security.get_current_active_user)):
+    user_org_query = select(models.Organization).join(models.User,
                                                 models.Organization.id == models.User.organization_id)
-    user_org = user_org_query.filter(models.Organization.id == current_user.organization_id).first()
+    user_org = await db.scalar(user_org_query.filter(models.Organization.id == current_user.organization_id))
     if not user_org:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f"Organization not found for Current user")
-    return user_org
\ No newline at end of file
+    return user_org
+
+
+@router.get("/principal-cache")
+async def read_principal_cache_stats(current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+    # Check permissions
+    utils.has_permission(current_user, "read:organizations")
+
+    return {**security.principal_cache.stats(), "token_revocations": security.token_revocations.stats()}
+
+
+@router.get("/password-pool")
+async def read_password_pool_stats(current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+    # Check permissions
+    utils.has_permission(current_user, "read:organizations")
+
+    return utils.password_pool.stats()
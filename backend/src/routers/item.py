@@ -1,17 +1,36 @@
-from fastapi import status, HTTPException, Depends, APIRouter, Response
-from typing import Annotated, List
+from fastapi import status, HTTPException, Depends, APIRouter, Response, Request
+from pydantic import ValidationError
+from typing import Annotated, List, Literal
 from src import models, schemas, security, utils
-from sqlalchemy.orm import Session
+from sqlalchemy import literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.database import get_db
+from src.pagination import paginate
+from src.bulk import iter_records, bulk_insert, export_response, BulkInsertError
+from src.crud import update_or_404, delete_or_404
+from src.search import full_text_match, prefix_match
+from src.tenancy import tenant_filter
+from src.responses import FastJSONResponse
+from src.config import settings
+from datetime import datetime
 
 router = APIRouter(
     prefix="/items",
     tags=["Items"]
 )
 
+BULK_IMPORT_BATCH_SIZE = 5000
+BULK_IMPORT_MAX_REPORTED_ERRORS = 1000
+ITEM_IMPORT_COLUMNS = ["name", "description", "price", "organization_id"]
+ITEM_SORT_COLUMNS = {"id": models.Item.id, "name": models.Item.name, "price": models.Item.price, "created_at": models.Item.created_at}
+ItemSort = Literal["id", "-id", "name", "-name", "price", "-price", "created_at", "-created_at"]
+# The fields of schemas.ItemPublic, in order, for FastJSONResponse (items have no is_active column)
+ITEM_PUBLIC_COLUMNS = (models.Item.name, models.Item.description, models.Item.price, models.Item.id, models.Item.organization_id,
+                       literal(True).label("is_active"), models.Item.created_at, models.Item.updated_at)
+
 # Create an Item
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.ItemPublic)
-async def create_item(item: schemas.ItemCreate, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def create_item(item: schemas.ItemCreate, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     utils.has_permission(current_user, "create:items")
     
     # Inject organization_id from token
@@ -20,59 +39,154 @@ async def create_item(item: schemas.ItemCreate, db: Session = Depends(get_db), c
 
     new_item = models.Item(**item_data)
     db.add(new_item)
-    db.commit()
-    db.refresh(new_item)
+    await db.commit()
+    await db.refresh(new_item)
     return new_item
 
+# Bulk import Items from a streamed NDJSON (default) or CSV (Content-Type: text/csv) body
+@router.post("/bulk", response_model=schemas.BulkImportResult)
+async def bulk_create_items(request: Request, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+    utils.has_permission(current_user, "create:items")
+
+    result = schemas.BulkImportResult(inserted=0, failed=0)
+    batch: List[dict] = []
+    batch_row_numbers: List[int] = []
+
+    def report_error(row_number: int, errors: List[str]):
+        result.failed += 1
+        if len(result.errors) < BULK_IMPORT_MAX_REPORTED_ERRORS:
+            result.errors.append(schemas.BulkRowError(row=row_number, errors=errors))
+
+    async def flush_batch():
+        try:
+            await bulk_insert(db, models.Item.__table__, ITEM_IMPORT_COLUMNS, batch)
+            await db.commit()
+            result.inserted += len(batch)
+        except BulkInsertError:
+            # The database refused a row the schema let through: retry the batch row by row to find and report it
+            await db.rollback()
+            for row_number, item_data in zip(batch_row_numbers, batch):
+                try:
+                    await bulk_insert(db, models.Item.__table__, ITEM_IMPORT_COLUMNS, [item_data])
+                    await db.commit()
+                    result.inserted += 1
+                except BulkInsertError as e:
+                    await db.rollback()
+                    report_error(row_number, [str(e)])
+        batch.clear()
+        batch_row_numbers.clear()
+
+    # Invalid rows are reported and skipped; valid rows are inserted and committed batch by batch
+    async for row_number, record, parse_error in iter_records(request.stream(), request.headers.get("content-type", "")):
+        errors = [parse_error] if parse_error else []
+        if not errors:
+            try:
+                item = schemas.ItemCreate.model_validate(record)
+            except ValidationError as e:
+                errors = [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+        if errors:
+            report_error(row_number, errors)
+            continue
+
+        # Inject organization_id from token
+        item_data = item.model_dump()
+        item_data["organization_id"] = current_user.organization_id
+        batch.append(item_data)
+        batch_row_numbers.append(row_number)
+        if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+            await flush_batch()
+
+    await flush_batch()
+    return result
+
+def search_items_query(dialect_name: str, current_user: security.TokenPrincipal, q: str | None = None, name: str | None = None,
+                       min_price: float | None = None, max_price: float | None = None,
+                       created_after: datetime | None = None, created_before: datetime | None = None, sort: ItemSort = "id"):
+    items_query = select(models.Item).filter(tenant_filter(models.Item.organization_id, current_user))
+
+    # Filters
+    if q:
+        items_query = items_query.filter(full_text_match(dialect_name, models.Item.name, q))
+    if name:
+        items_query = items_query.filter(prefix_match(models.Item.name, name))
+    if min_price is not None:
+        items_query = items_query.filter(models.Item.price >= min_price)
+    if max_price is not None:
+        items_query = items_query.filter(models.Item.price <= max_price)
+    if created_after is not None:
+        items_query = items_query.filter(models.Item.created_at >= created_after)
+    if created_before is not None:
+        items_query = items_query.filter(models.Item.created_at < created_before)
+
+    # Sort, with id as the tie-breaker so pages are stable; both run the same direction so an
+    # (organization_id, <sort column>, id) index can return the page without sorting
+    sort_columns = (ITEM_SORT_COLUMNS[sort.lstrip("-")], models.Item.id)
+    items_query = items_query.order_by(*(column.desc() if sort.startswith("-") else column for column in sort_columns))
+    return items_query
+
+def export_items_query(current_user: security.TokenPrincipal):
+    return select(models.Item.id, models.Item.name, models.Item.description, models.Item.price,
+                  models.Item.organization_id, models.Item.created_at, models.Item.updated_at).filter(
+                  tenant_filter(models.Item.organization_id, current_user)).order_by(models.Item.id)
+
+def item_criteria(current_user: security.TokenPrincipal, item_id: int) -> tuple:
+    """WHERE clause of the single-item endpoints (GET, PUT and DELETE /items/{item_id})."""
+    return models.Item.id == item_id, tenant_filter(models.Item.organization_id, current_user)
+
 # Get All Items
-@router.get("/", response_model=List[schemas.ItemPublic])
-async def get_items(skip: int = 0, limit: int = 10, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+@router.get("/", response_model=List[schemas.ItemPublic] | schemas.CursorPage[schemas.ItemPublic])
+async def get_items(skip: int = 0, limit: int = 10, cursor: str | None = None,
+                    q: str | None = None, name: str | None = None,
+                    min_price: float | None = None, max_price: float | None = None,
+                    created_after: datetime | None = None, created_before: datetime | None = None,
+                    sort: ItemSort = "id",
+                    db: AsyncSession = Depends(get_db), current_user: security.TokenPrincipal = Depends(security.get_token_principal)):
     utils.has_permission(current_user, "read:items")
-    items_query = db.query(models.Item)
-    if not current_user.is_platform_admin:
-        items_query = items_query.filter(models.Item.organization_id == current_user.organization_id)
-    items = items_query.offset(skip).limit(limit).all()
-    return items
+    if cursor is not None and sort != "id":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor pagination only supports sort=id")
+
+    items_query = search_items_query(db.get_bind().dialect.name, current_user, q, name, min_price, max_price, created_after, created_before, sort)
+    if settings.FAST_JSON_RESPONSES:
+        page = await paginate(db, items_query.with_only_columns(*ITEM_PUBLIC_COLUMNS), models.Item.id, skip, limit, cursor, as_rows=True)
+        return FastJSONResponse(page)
+    return await paginate(db, items_query, models.Item.id, skip, limit, cursor)
+
+
+# Export all Items as NDJSON or CSV
+@router.get("/export")
+async def export_items(format: Literal["ndjson", "csv"] = "ndjson", current_user: security.TokenPrincipal = Depends(security.get_token_principal)):
+    utils.has_permission(current_user, "read:items")
+    return export_response(export_items_query(current_user), format, "items", current_user)
 
 
 # Get Item with id
 @router.get("/{item_id}", response_model=schemas.ItemPublic)
-async def get_item(item_id: int, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def get_item(item_id: int, db: AsyncSession = Depends(get_db), current_user: security.TokenPrincipal = Depends(security.get_token_principal)):
     # Check permissions
     utils.has_permission(current_user, "read:items")
 
-    item_query = db.query(models.Item)
-    if not current_user.is_platform_admin:
-        item_query = item_query.filter(models.Item.organization_id == current_user.organization_id)
-    item  = item_query.filter(models.Item.id == item_id).first()
+    item  = await db.scalar(select(models.Item).filter(*item_criteria(current_user, item_id)))
     if not item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Item with id:  {item_id} not found")
     return item
 
 # Update Item with id
 @router.put("/{item_id}", response_model=schemas.ItemPublic)
-def update_item(item_id: int, updated_item: schemas.ItemCreate, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def update_item(item_id: int, updated_item: schemas.ItemCreate, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "update:items")
     
-    item_query = db.query(models.Item).filter(models.Item.organization_id == current_user.organization_id).filter(models.Item.id == item_id)
-    item = item_query.first()
-    if item == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Item with id: {item_id} does not exist")
-    item_query.update(updated_item.model_dump(), synchronize_session=False)
-    db.commit()
-    return item_query.first()
+    item = await update_or_404(db, models.Item, updated_item.model_dump(), *item_criteria(current_user, item_id),
+                               detail=f"Item with id: {item_id} does not exist")
+    await db.commit()
+    return item
 
 # Delete Item with id
 @router.delete("/{item_id}")
-def delete_item(item_id: int, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def delete_item(item_id: int, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "delete:items")
         
-    item_query = db.query(models.Item).filter(models.Item.id == item_id)
-    item = item_query.first()
-    if item == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Item with id: {item_id} does not exist")
-    item_query.delete(synchronize_session=False)
-    db.commit()
+    await delete_or_404(db, models.Item, *item_criteria(current_user, item_id), detail=f"Item with id: {item_id} does not exist")
+    await db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
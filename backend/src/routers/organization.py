@@ -1,8 +1,11 @@
 from fastapi import status, HTTPException, Depends, APIRouter, Response
 from typing import Annotated
 from src import models, schemas, security, utils
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.database import get_db
+from src.pagination import paginate
+from src.crud import update_or_404, delete_or_404
 from typing import List
 
 router = APIRouter(
@@ -12,61 +15,58 @@ router = APIRouter(
 
 # Create an Organization
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.OrganizationPublic)
-async def create_organization(organization: schemas.OrganizationCreate, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def create_organization(organization: schemas.OrganizationCreate, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "create:organizations")
     
     new_org = models.Organization(**organization.model_dump())
     db.add(new_org)
-    db.commit()
-    db.refresh(new_org)
+    await db.commit()
+    await db.refresh(new_org)
     return new_org
 
 # Get All Organizations
-@router.get("/")
-async def get_organizations(skip: int = 0, limit: int = 10, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+@router.get("/", response_model=List[schemas.OrganizationPublic] | schemas.CursorPage[schemas.OrganizationPublic])
+async def get_organizations(skip: int = 0, limit: int = 10, cursor: str | None = None, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "read:organizations")
     
-    organizations = db.query(models.Organization).offset(skip).limit(limit).all()
-    return organizations
+    return await paginate(db, select(models.Organization), models.Organization.id, skip, limit, cursor)
 
 # Get Organization with id
 @router.get("/{organization_id}", response_model=schemas.OrganizationPublic)
-async def get_organization(organization_id: str, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def get_organization(organization_id: str, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "read:organizations")
     
-    organization  = db.query(models.Organization).filter(models.Organization.id == organization_id).first()
+    organization  = await db.scalar(select(models.Organization).filter(models.Organization.id == organization_id))
     if not organization:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Organization with id:  {organization_id} not found")
     return organization
 
 # Update Organization with id
 @router.put("/{organization_id}", response_model=schemas.OrganizationPublic)
-def update_organization(organization_id: str, updated_organization: schemas.OrganizationCreate, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def update_organization(organization_id: str, updated_organization: schemas.OrganizationCreate, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "update:organizations")
     
-    organization_query = db.query(models.Organization).filter(models.Organization.id == organization_id)
-    organization = organization_query.first()
-    if organization == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Organization with id: {organization_id} does not exist")
-    organization_query.update(updated_organization.model_dump(), synchronize_session=False)
-    db.commit()
-    return organization_query.first()
+    organization = await update_or_404(db, models.Organization, updated_organization.model_dump(),
+                                       models.Organization.id == organization_id,
+                                       detail=f"Organization with id: {organization_id} does not exist")
+    await db.commit()
+    # Tokens carry the organization id only, so renames keep the members' sessions
+    security.invalidate_organization_principals(organization_id, revoke_tokens=organization.id != organization_id)
+    return organization
 
 
 # Delete Organization with id
 @router.delete("/{organization_id}")
-def delete_organization(organization_id: str, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def delete_organization(organization_id: str, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "delete:organizations")
     
-    organization_query = db.query(models.Organization).filter(models.Organization.id == organization_id)
-    organization = organization_query.first()
-    if organization == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Organization with id: {organization_id} does not exist")
-    organization_query.delete(synchronize_session=False)
-    db.commit()
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    await delete_or_404(db, models.Organization, models.Organization.id == organization_id,
+                        detail=f"Organization with id: {organization_id} does not exist")
+    await db.commit()
+    security.invalidate_organization_principals(organization_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
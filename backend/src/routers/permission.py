@@ -1,8 +1,13 @@
 from fastapi import status, HTTPException, Depends, APIRouter, Response
-from typing import Annotated
+from typing import Annotated, List
 from src import models, schemas, security, utils
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.database import get_db
+from src.pagination import paginate
+from src.assignments import invalidate_assignment_catalog
+from src.crud import update_or_404, delete_or_404
+from src.permissions import permission_catalog, remove_permission_from_effective_permissions
 
 router = APIRouter(
     prefix="/permissions",
@@ -11,63 +16,66 @@ router = APIRouter(
 
 # Create a Permission
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.PermissionPublic)
-async def create_permission(permission: schemas.PermissionCreate, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def create_permission(permission: schemas.PermissionCreate, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "create:permissions")
     
     new_permission = models.Permission(**permission.model_dump())
     db.add(new_permission)
-    db.commit()
-    db.refresh(new_permission)
+    await db.commit()
+    await db.refresh(new_permission)
+    permission_catalog.invalidate()
+    invalidate_assignment_catalog(models.Permission)
     return new_permission
 
 # Get All Permissions
-@router.get("/")
-async def get_permissions(skip: int = 0, limit: int = 10, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+@router.get("/", response_model=List[schemas.PermissionPublic] | schemas.CursorPage[schemas.PermissionPublic])
+async def get_permissions(skip: int = 0, limit: int = 10, cursor: str | None = None, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "read:permissions")
     
-    permissions = db.query(models.Permission).offset(skip).limit(limit).all()
-    return permissions
+    return await paginate(db, select(models.Permission), models.Permission.id, skip, limit, cursor)
 
 
 # Get Permission with id
 @router.get("/{permission_id}", response_model=schemas.PermissionPublic)
-async def get_permission(permission_id: int, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def get_permission(permission_id: int, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "read:permissions")
     
-    permission  = db.query(models.Permission).filter(models.Permission.id == permission_id).first()
+    permission  = await db.scalar(select(models.Permission).filter(models.Permission.id == permission_id))
     if not permission:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Permission with id:  {permission_id} not found")
     return permission
 
 # Update Permission with id
 @router.put("/{permission_id}", response_model=schemas.PermissionPublic)
-def update_permission(permission_id: int, updated_permission: schemas.PermissionCreate, db: Session = Depends(get_db), current_user = Depends(security.get_current_active_user)):
+async def update_permission(permission_id: int, updated_permission: schemas.PermissionCreate, db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "update:permissions")
     
-    permission_query = db.query(models.Permission).filter(models.Permission.id == permission_id)
-    permission = permission_query.first()
-    if permission == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Permission with id: {permission_id} does not exist")
-    permission_query.update(updated_permission.model_dump(), synchronize_session=False)
-    db.commit()
-    return permission_query.first()
+    permission = await update_or_404(db, models.Permission, updated_permission.model_dump(),
+                                     models.Permission.id == permission_id,
+                                     detail=f"Permission with id: {permission_id} does not exist")
+    await db.commit()
+    permission_catalog.invalidate()
+    invalidate_assignment_catalog(models.Permission)
+    return permission
 
 # Delete Permission with id
 @router.delete("/{permission_id}")
-def delete_permission(permission_id: int, db: Session = Depends(get_db), current_user = Depends(security.get_current_active_user)):
+async def delete_permission(permission_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "delete:permissions")
     
-    permission_query = db.query(models.Permission).filter(models.Permission.id == permission_id)
-    permission = permission_query.first()
-    if permission == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Permission with id: {permission_id} does not exist")
-    permission_query.delete(synchronize_session=False)
-    db.commit()
+    # Detach the permission first; if it does not exist the request's transaction is rolled back with the 404
+    await db.execute(delete(models.role_permissions).filter(models.role_permissions.c.permission_id == permission_id))
+    await remove_permission_from_effective_permissions(db, permission_id)
+    await delete_or_404(db, models.Permission, models.Permission.id == permission_id,
+                        detail=f"Permission with id: {permission_id} does not exist")
+    await db.commit()
+    permission_catalog.invalidate()
+    invalidate_assignment_catalog(models.Permission)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -1,8 +1,20 @@
-from fastapi import status, HTTPException, Depends, APIRouter, Response
+from fastapi import status, HTTPException, Depends, APIRouter, Response, Query
+from fastapi.responses import StreamingResponse
+import json
 from typing import Annotated
 from src import models, schemas, security, utils
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import ColumnElement
 from src.database import get_db
+from src.pagination import paginate
+from src.crud import update_or_404, delete_or_404, add_associations, remove_associations
+from src.permissions import refresh_effective_permissions, refresh_role_members_effective_permissions, grant_role_effective_permissions
+from src.bulk import EXPORT_BATCH_SIZE, EXPORT_MEDIA_TYPES
+from src.assignments import assignment_matrix, invalidate_assignment_catalog, MAX_MATRIX_LIMIT
+from src.tenancy import tenant_filter
+from src.responses import FastJSONResponse
+from src.config import settings
 from typing import List
 
 router = APIRouter(
@@ -10,117 +22,240 @@ router = APIRouter(
     tags=["Roles"]
 )
 
+ROLE_EXPANSIONS = {"users", "permissions"}
+MAX_EXPAND_LIMIT = 100
+
+def parse_expand(expand: str | None):
+    expansions = {part.strip() for part in expand.split(",") if part.strip()} if expand else set()
+    unknown = expansions - ROLE_EXPANSIONS
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown expand value(s): {', '.join(sorted(unknown))}")
+    return expansions
+
+def role_members_filter(current_user: schemas.CurrentUser) -> ColumnElement[bool]:
+    # Roles are shared across organizations; members are only listed for the caller's organization
+    return tenant_filter(models.User.organization_id, current_user)
+
+def role_users_query(current_user: schemas.CurrentUser, role_id: int):
+    return select(models.User).join(models.user_roles, models.user_roles.c.user_id == models.User.id).filter(
+        models.user_roles.c.role_id == role_id, role_members_filter(current_user))
+
+def member_ids_in_scope_query(current_user: schemas.CurrentUser, user_ids: List[int]):
+    """The ids among `user_ids` the caller may assign roles to."""
+    return select(models.User.id).filter(models.User.id.in_(user_ids), role_members_filter(current_user))
+
+def role_count_columns(current_user: schemas.CurrentUser):
+    user_count = select(func.count()).select_from(models.user_roles).join(
+        models.User, models.User.id == models.user_roles.c.user_id).filter(
+        models.user_roles.c.role_id == models.Role.id, role_members_filter(current_user)).correlate(models.Role).scalar_subquery()
+    permission_count = select(func.count()).select_from(models.role_permissions).filter(
+        models.role_permissions.c.role_id == models.Role.id).correlate(models.Role).scalar_subquery()
+    return user_count.label("user_count"), permission_count.label("permission_count")
+
+def role_with_counts_query(current_user: schemas.CurrentUser):
+    return select(models.Role, *role_count_columns(current_user))
+
+def role_counts_query(current_user: schemas.CurrentUser):
+    return select(*role_count_columns(current_user)).select_from(models.Role)
+
+async def build_role_public(db: AsyncSession, role: models.Role, user_count: int, permission_count: int,
+                            expansions: set, expand_limit: int, current_user: schemas.CurrentUser):
+    role_public = schemas.RolePublic(id=role.id, name=role.name, description=role.description, created_at=role.created_at,
+                                     updated_at=role.updated_at, user_count=user_count, permission_count=permission_count)
+    if "users" in expansions:
+        users = (await db.scalars(role_users_query(current_user, role.id).order_by(models.User.id).limit(expand_limit))).all()
+        role_public.users = [schemas.UserPublic.model_validate(user) for user in users]
+    if "permissions" in expansions:
+        permissions_query = select(models.Permission).join(
+            models.role_permissions, models.role_permissions.c.permission_id == models.Permission.id).filter(
+            models.role_permissions.c.role_id == role.id)
+        permissions = (await db.scalars(permissions_query.order_by(models.Permission.id).limit(expand_limit))).all()
+        role_public.permissions = [schemas.PermissionPublic.model_validate(permission, from_attributes=True) for permission in permissions]
+    return role_public
+
 # Create a Role
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.RolePublic)
-async def create_role(role: schemas.RoleCreate, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def create_role(role: schemas.RoleCreate, expand: str | None = None, expand_limit: int = Query(20, ge=1, le=MAX_EXPAND_LIMIT), db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "create:roles")
+    expansions = parse_expand(expand)
     
     new_role = models.Role(**role.model_dump())
     db.add(new_role)
-    db.commit()
-    db.refresh(new_role)
-    return new_role
+    await db.commit()
+    invalidate_assignment_catalog(models.Role)
+    await db.refresh(new_role)
+    return await build_role_public(db, new_role, 0, 0, expansions, expand_limit, current_user)
 
 # Get All Roles
-@router.get("/")
-async def get_roles(skip: int = 0, limit: int = 10, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+@router.get("/", response_model=List[schemas.RolePublic] | schemas.CursorPage[schemas.RolePublic])
+async def get_roles(skip: int = 0, limit: int = 10, cursor: str | None = None, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "read:roles")
     
-    roles_query = db.query(models.Role)
+    # Plain columns rather than Role entities, so validating RolePublic never touches the lazy relationships
+    roles_query = select(models.Role.id, models.Role.name, models.Role.description, models.Role.created_at,
+                         models.Role.updated_at, *role_count_columns(current_user))
     if not current_user.is_platform_admin:
         roles_query = roles_query.filter(models.Role.is_platform_level == False)
 
-    roles = roles_query.offset(skip).limit(limit).all()
-    return roles
+    return await paginate(db, roles_query, models.Role.id, skip, limit, cursor, as_rows=True)
 
 # Get Role with id
 @router.get("/{role_id}", response_model=schemas.RolePublic)
-async def get_role(role_id: int, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def get_role(role_id: int, expand: str | None = None, expand_limit: int = Query(20, ge=1, le=MAX_EXPAND_LIMIT), db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "read:roles")
+    expansions = parse_expand(expand)
     
-    role_query = db.query(models.Role)
+    role_query = role_with_counts_query(current_user)
     if not current_user.is_platform_admin:
         role_query = role_query.filter(models.Role.is_platform_level == False)
         
-    role  = role_query.filter(models.Role.id == role_id).first()
-    if not role:
+    row = (await db.execute(role_query.filter(models.Role.id == role_id))).first()
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Role with id:  {role_id} not found")
-    return role
+    return await build_role_public(db, row.Role, row.user_count, row.permission_count, expansions, expand_limit, current_user)
 
 # Update Role with id
 @router.put("/{role_id}", response_model=schemas.RolePublic)
-def update_role(role_id: int, updated_role: schemas.RoleCreate, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def update_role(role_id: int, updated_role: schemas.RoleCreate, expand: str | None = None, expand_limit: int = Query(20, ge=1, le=MAX_EXPAND_LIMIT), db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "update:roles")
+    expansions = parse_expand(expand)
     
-    role_query = db.query(models.Role).filter(models.Role.id == role_id)
-    role = role_query.first()
-    if role == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Role with id: {role_id} does not exist")
-    role_query.update(updated_role.model_dump(), synchronize_session=False)
-    db.commit()
-    return role_query.first()
+    role = await update_or_404(db, models.Role, updated_role.model_dump(), models.Role.id == role_id,
+                               detail=f"Role with id: {role_id} does not exist")
+    await db.commit()
+    invalidate_assignment_catalog(models.Role)
+    counts = (await db.execute(role_counts_query(current_user).filter(models.Role.id == role_id))).one()
+    return await build_role_public(db, role, counts.user_count, counts.permission_count, expansions, expand_limit, current_user)
 
 
 # Delete Role with id
 @router.delete("/{role_id}")
-def delete_role(role_id: int, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def delete_role(role_id: int, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "delete:roles")
     
-    role_query = db.query(models.Role).filter(models.Role.id == role_id)
-    role = role_query.first()
-    if role == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Role with id: {role_id} does not exist")
-    role_query.delete(synchronize_session=False)
-    db.commit()
+    # Detach the role from its users and permissions, then recompute what its former members can do.
+    # If the role does not exist the request's transaction is rolled back with the 404
+    member_ids = (await db.scalars(delete(models.user_roles).filter(models.user_roles.c.role_id == role_id).returning(models.user_roles.c.user_id))).all()
+    await db.execute(delete(models.role_permissions).filter(models.role_permissions.c.role_id == role_id))
+    await delete_or_404(db, models.Role, models.Role.id == role_id, detail=f"Role with id: {role_id} does not exist")
+    await refresh_effective_permissions(db, member_ids)
+    await db.commit()
+    invalidate_assignment_catalog(models.Role)
+    security.revoke_user_tokens(*member_ids)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
-# Get all Permissions for a Role
-@router.get("/{role_id}/permissions", response_model=List[schemas.PermissionWithAssignment])
-def get_role_permissions(role_id: int, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+# Get the Users holding a Role
+@router.get("/{role_id}/users", response_model=List[schemas.UserPublic] | schemas.CursorPage[schemas.UserPublic])
+async def get_role_users(role_id: int, skip: int = 0, limit: int = Query(10, ge=1, le=MAX_EXPAND_LIMIT), cursor: str | None = None, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "read:roles")
-    
-    role_query = db.query(models.Role)
+
+    role_query = select(models.Role.id).filter(models.Role.id == role_id)
     if not current_user.is_platform_admin:
         role_query = role_query.filter(models.Role.is_platform_level == False)
-    role = role_query.filter(models.Role.id == role_id).first()
-    if not role:
+    if await db.scalar(role_query) is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Role with id: {role_id} not found")
 
-    # Fetch all permissions and check if assigned to role
-    permissions_query = db.query(models.Permission)
+    return await paginate(db, role_users_query(current_user, role_id), models.User.id, skip, limit, cursor)
+
+def iter_members_batch_results(user_ids: List[int], added_user_ids: List[int]):
+    added_user_ids = set(added_user_ids)
+    for start in range(0, len(user_ids), EXPORT_BATCH_SIZE):
+        yield "".join(
+            json.dumps({"user_id": user_id, "status": "added" if user_id in added_user_ids else "unchanged"}) + "\n"
+            for user_id in user_ids[start:start + EXPORT_BATCH_SIZE]
+        )
+
+# Assign a Role to many Users at once
+@router.post("/{role_id}/members:batch")
+async def add_role_members_batch(role_id: int, batch: schemas.RoleMembersBatch, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+    # Check permissions
+    utils.has_permission(current_user, "update:users")
+
+    user_ids = list(dict.fromkeys(batch.user_ids))
+    if len(user_ids) > settings.ROLE_MEMBERS_BATCH_MAX:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"At most {settings.ROLE_MEMBERS_BATCH_MAX} users can be assigned per request")
+
+    role_query = select(models.Role.id).filter(models.Role.id == role_id)
     if not current_user.is_platform_admin:
-        permissions_query = permissions_query.filter(models.Permission.is_platform_level == False)
+        role_query = role_query.filter(models.Role.is_platform_level == False)
+    if await db.scalar(role_query) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Role with id: {role_id} not found")
+
+    # Validate the whole batch in one query; nothing is written unless every user belongs to the caller's organization
+    valid_user_ids = set(await db.scalars(member_ids_in_scope_query(current_user, user_ids)))
+    invalid_user_ids = [user_id for user_id in user_ids if user_id not in valid_user_ids]
+    if invalid_user_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Users not found in your organization: {invalid_user_ids[:20]}")
+
+    added_user_ids = await add_associations(db, models.user_roles, "role_id", role_id, "user_id", models.User, user_ids)
+    await grant_role_effective_permissions(db, role_id, added_user_ids)
+    await db.commit()
+    if added_user_ids:
+        security.invalidate_user_principals(*added_user_ids)
 
-    all_permissions = permissions_query.all()
-    assigned_permission_ids = {permission.id for permission in role.permissions}
+    return StreamingResponse(iter_members_batch_results(user_ids, added_user_ids), media_type=EXPORT_MEDIA_TYPES["ndjson"])
 
-    permissions_with_assignment: List[schemas.PermissionWithAssignment] = []
 
-    for permission in all_permissions:
-        is_assigned = permission.id in assigned_permission_ids
-        permissions_with_assignment.append(schemas.PermissionWithAssignment(id=permission.id, name=permission.name, assigned=is_assigned))
+# Get all Permissions for a Role
+@router.get("/{role_id}/permissions", response_model=List[schemas.PermissionWithAssignment])
+async def get_role_permissions(role_id: int, name: str | None = None, skip: int = 0, limit: int | None = Query(None, ge=1, le=MAX_MATRIX_LIMIT), db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+    # Check permissions
+    utils.has_permission(current_user, "read:roles")
     
-    return permissions_with_assignment
+    role_query = select(models.Role.id).filter(models.Role.id == role_id)
+    if not current_user.is_platform_admin:
+        role_query = role_query.filter(models.Role.is_platform_level == False)
+    if await db.scalar(role_query) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Role with id: {role_id} not found")
 
+    # Every permission the caller can see, flagged with whether the role grants it
+    matrix = await assignment_matrix(db, models.Permission, models.role_permissions, "role_id", role_id, "permission_id",
+                                     include_platform_level=current_user.is_platform_admin, name=name, skip=skip, limit=limit)
+    return FastJSONResponse(matrix) if settings.FAST_JSON_RESPONSES else matrix
+
+
+async def commit_permission_changes(db: AsyncSession, role_id: int, added: List[int], removed: List[int]):
+    # Only recompute the members' permissions when the assignment actually changed
+    if added or removed:
+        await refresh_role_members_effective_permissions(db, role_id)
+        await db.commit()
+        # Members' tokens still carry the old permissions
+        security.revoke_user_tokens(*await db.scalars(select(models.user_roles.c.user_id).filter(models.user_roles.c.role_id == role_id)))
+    return schemas.AssignmentChanges(message="Permissions updated successfully", added=added, removed=removed)
 
 # Batch assign/remove permissions to a Role
-@router.post("/{role_id}/permissions")
-def update_role_permissions(role_id: int, permission_ids: List[int], db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+@router.post("/{role_id}/permissions", response_model=schemas.AssignmentChanges)
+async def update_role_permissions(role_id: int, permission_ids: List[int], db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "update:roles")
     
-    role = db.query(models.Role).filter(models.Role.id == role_id).first()
-    if not role:
+    if await db.scalar(select(models.Role.id).filter(models.Role.id == role_id)) == None:
+        raise HTTPException(status_code=404, detail="Role not found")
+
+    # Replace the role's permissions with permission_ids, touching only the rows that differ
+    removed = await remove_associations(db, models.role_permissions, "role_id", role_id, "permission_id", keep_ids=permission_ids)
+    added = await add_associations(db, models.role_permissions, "role_id", role_id, "permission_id", models.Permission, permission_ids)
+    return await commit_permission_changes(db, role_id, added, removed)
+
+# Add/Remove some permissions of a Role
+@router.patch("/{role_id}/permissions", response_model=schemas.AssignmentChanges)
+async def patch_role_permissions(role_id: int, changes: schemas.AssignmentPatch, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+    # Check permissions
+    utils.has_permission(current_user, "update:roles")
+
+    if set(changes.add) & set(changes.remove):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A permission can not be both added and removed")
+
+    if await db.scalar(select(models.Role.id).filter(models.Role.id == role_id)) == None:
         raise HTTPException(status_code=404, detail="Role not found")
 
-    new_permissions = db.query(models.Permission).filter(models.Permission.id.in_(permission_ids)).all()
-    role.permissions = new_permissions  # Replaces all existing permissions
-    db.commit()
-    return {"message": "Permissions updated successfully"}
\ No newline at end of file
+    removed = await remove_associations(db, models.role_permissions, "role_id", role_id, "permission_id", target_ids=changes.remove)
+    added = await add_associations(db, models.role_permissions, "role_id", role_id, "permission_id", models.Permission, changes.add)
+    return await commit_permission_changes(db, role_id, added, removed)
@@ -1,8 +1,17 @@
-from fastapi import status, HTTPException, Depends, APIRouter, Response
+from fastapi import status, HTTPException, Depends, APIRouter, Response, Query
 from src import models, schemas, utils, security
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.database import get_db
-from typing import List
+from src.pagination import paginate
+from src.bulk import export_response
+from src.crud import update_or_404, add_associations, remove_associations
+from src.permissions import refresh_effective_permissions
+from src.assignments import assignment_matrix, MAX_MATRIX_LIMIT
+from src.tenancy import tenant_filter
+from src.responses import FastJSONResponse
+from src.config import settings
+from typing import List, Literal
 
 router = APIRouter(
     prefix="/users",
@@ -11,49 +20,61 @@ router = APIRouter(
 
 # Create User
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.UserPublic)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "create:users")
     
     # hash the password
-    hashed_password = utils.hash_password(user.password)
+    hashed_password = await utils.hash_password_async(user.password)
     user.password = hashed_password
 
     new_user = models.User(**user.model_dump())
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
+def users_query(current_user: schemas.CurrentUser):
+    return select(models.User).filter(tenant_filter(models.User.organization_id, current_user))
+
+def export_users_query(current_user: schemas.CurrentUser):
+    return select(models.User.id, models.User.username, models.User.email, models.User.name, models.User.is_active,
+                  models.User.organization_id, models.User.created_at, models.User.updated_at).filter(
+                  tenant_filter(models.User.organization_id, current_user)).order_by(models.User.id)
+
 # Get All Users
-@router.get("/")
-async def get_users(skip: int = 0, limit: int = 10, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+@router.get("/", response_model=List[schemas.UserPublic] | schemas.CursorPage[schemas.UserPublic])
+async def get_users(skip: int = 0, limit: int = 10, cursor: str | None = None, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "read:users")
     
-    users_query = db.query(models.User)
-    if not current_user.is_platform_admin:
-        users_query = users_query.filter(models.User.organization_id == current_user.organization_id)
-    users = users_query.offset(skip).limit(limit).all()
-    return users
+    return await paginate(db, users_query(current_user), models.User.id, skip, limit, cursor)
+
+# Export all Users as NDJSON or CSV
+@router.get("/export")
+async def export_users(format: Literal["ndjson", "csv"] = "ndjson", current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+    # Check permissions
+    utils.has_permission(current_user, "read:users")
+
+    return export_response(export_users_query(current_user), format, "users", current_user)
 
 # Get User with id
 @router.get("/{user_id}", response_model=schemas.UserPublic)
-def get_user(user_id: int, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "read:users")
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.scalar(select(models.User).filter(models.User.id == user_id, tenant_filter(models.User.organization_id, current_user)))
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"user with id: {user_id} not found")
     return user
 
 # Get User's Organization   
 @router.get("/{user_id}/organization", response_model=schemas.OrganizationPublic)
-async def get_user_organization(user_id: int, db: Session = Depends(get_db)):
-    user_org_query = db.query(models.Organization).join(models.User,
+async def get_user_organization(user_id: int, db: AsyncSession = Depends(get_db)):
+    user_org_query = select(models.Organization).join(models.User,
                                                 models.Organization.id == models.User.organization_id)
-    user_org = user_org_query.filter(models.User.id == user_id).first()
+    user_org = await db.scalar(user_org_query.filter(models.User.id == user_id))
     if not user_org:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f"Organization not found for user with ID: {user_id}")
@@ -61,21 +82,29 @@ async def get_user_organization(user_id: int, db: Session = Depends(get_db)):
 
 # Update User with id
 @router.put("/{user_id}", response_model=schemas.UserPublic)
-def update_user(user_id: int, updated_user: schemas.UserUpdate, db: Session = Depends(get_db), current_user = Depends(security.get_current_user)):
+async def update_user(user_id: int, updated_user: schemas.UserUpdate, db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_user)):
     # Check permissions
     utils.has_permission(current_user, "update:users")
     
-    user_query = db.query(models.User).filter(models.User.id == user_id)
-    user = user_query.first()
-    if user == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id: {user_id} does not exist")
-    user_query.update(updated_user.model_dump(), synchronize_session=False)
-    db.commit()
-    return user_query.first()
+    # is_active only changes when it is given
+    values = updated_user.model_dump(exclude={"is_active"} if updated_user.is_active is None else None)
+    previous = (await db.execute(select(models.User.username, models.User.organization_id, models.User.is_active).filter(
+        models.User.id == user_id, tenant_filter(models.User.organization_id, current_user)))).first()
+    user = await update_or_404(db, models.User, values, models.User.id == user_id, tenant_filter(models.User.organization_id, current_user),
+                               detail=f"User with id: {user_id} does not exist")
+    if not user.is_active:
+        # A deactivated user can not renew their session
+        await security.revoke_refresh_tokens(db, user_id)
+    await db.commit()
+    # The username or organization may have changed, so drop every cached principal for this user; its tokens
+    # only stop working when a value they carry changed, not on name or email edits
+    claims_changed = (user.username, user.organization_id, user.is_active) != tuple(previous)
+    security.invalidate_user_principals(user_id, revoke_tokens=claims_changed)
+    return user
 
 # Delete User with id
 @router.delete("/{user_id}")
-def delete_role(user_id: int, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
+async def delete_role(user_id: int, db: AsyncSession = Depends(get_db), current_user: schemas.CurrentUser = Depends(security.get_current_active_user)):
     # Check permissions
     utils.has_permission(current_user, "delete:users")
     
@@ -86,53 +115,73 @@ def delete_role(user_id: int, db: Session = Depends(get_db), current_user: schem
             detail="You cannot delete your own account!"
     )
 
-    user_query = db.query(models.User).filter(models.User.id == user_id)
-    user = user_query.first()
-    if user == None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id: {user_id} does not exist")
-    if user.username.lower().startswith("admin"):
+    # Detach the user's roles and derived permissions first; if nothing is deleted below, the request's
+    # transaction is rolled back with the error
+    await db.execute(delete(models.user_roles).filter(models.user_roles.c.user_id == user_id))
+    await db.execute(delete(models.user_effective_permissions).filter(models.user_effective_permissions.c.user_id == user_id))
+    delete_query = delete(models.User).filter(models.User.id == user_id, tenant_filter(models.User.organization_id, current_user),
+                                              ~func.lower(models.User.username).startswith("admin"))
+    deleted = (await db.execute(delete_query.returning(models.User.organization_id, models.User.username).execution_options(synchronize_session=False))).first()
+    if deleted == None:
+        # Nothing was deleted, look the user up only to tell a missing user from a protected one
+        if await db.scalar(select(models.User.id).filter(models.User.id == user_id, tenant_filter(models.User.organization_id, current_user))) == None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id: {user_id} does not exist")
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Can not delete an admin user!")
-    user_query.delete(synchronize_session=False)
-    db.commit()
+    await db.commit()
+    security.invalidate_principal(deleted.organization_id, deleted.username, user_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 # Get all Roles for a User
 @router.get("/{user_id}/roles", response_model=List[schemas.RoleWithAssignment])
-def get_user_roles(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
+async def get_user_roles(user_id: int, name: str | None = None, skip: int = 0, limit: int | None = Query(None, ge=1, le=MAX_MATRIX_LIMIT), db: AsyncSession = Depends(get_db)):
+    is_platform_admin = await db.scalar(select(models.User.is_platform_admin).filter(models.User.id == user_id))
+    if is_platform_admin is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User with id: {user_id} not found")
-    
-    roles_query = db.query(models.Role)
-    if not user.is_platform_admin:
-        roles_query = roles_query.filter(models.Role.is_platform_level == False)
 
-    # Fetch all roles and check if assigned to current user
-    all_roles = roles_query.all()
-    assigned_role_ids = { role.id for role in user.roles }
+    # Every role the user can hold, flagged with whether the user holds it
+    matrix = await assignment_matrix(db, models.Role, models.user_roles, "user_id", user_id, "role_id",
+                                     include_platform_level=is_platform_admin, name=name, skip=skip, limit=limit)
+    return FastJSONResponse(matrix) if settings.FAST_JSON_RESPONSES else matrix
 
-    roles_with_assignment: List[schemas.RoleWithAssignment] = []
-
-    for role in all_roles:
-        is_assigned = role.id in assigned_role_ids
-        roles_with_assignment.append(schemas.RoleWithAssignment(id=role.id, name=role.name, assigned=is_assigned))
-    
-    return roles_with_assignment
+async def commit_role_changes(db: AsyncSession, user_id: int, user, added: List[int], removed: List[int]):
+    # Only recompute permissions and drop the cached principal when the assignment actually changed
+    if added or removed:
+        await refresh_effective_permissions(db, [user_id])
+        await db.commit()
+        security.invalidate_principal(user.organization_id, user.username, user_id)
+    return schemas.AssignmentChanges(message="Roles updated successfully", added=added, removed=removed)
 
 # Assign/Remove Roles to a User in batch
-@router.post("/{user_id}/roles")
-def update_user_roles(user_id: int, role_ids: List[int], db: Session = Depends(get_db), current_user = Depends(security.get_current_user)):
+@router.post("/{user_id}/roles", response_model=schemas.AssignmentChanges)
+async def update_user_roles(user_id: int, role_ids: List[int], db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_user)):
     # Check permissions
     utils.has_permission(current_user, "update:users")
     
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = (await db.execute(select(models.User.organization_id, models.User.username).filter(models.User.id == user_id))).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # Replace the user's roles with role_ids, touching only the rows that differ
+    removed = await remove_associations(db, models.user_roles, "user_id", user_id, "role_id", keep_ids=role_ids)
+    added = await add_associations(db, models.user_roles, "user_id", user_id, "role_id", models.Role, role_ids)
+    return await commit_role_changes(db, user_id, user, added, removed)
+
+# Add/Remove some Roles of a User
+@router.patch("/{user_id}/roles", response_model=schemas.AssignmentChanges)
+async def patch_user_roles(user_id: int, changes: schemas.AssignmentPatch, db: AsyncSession = Depends(get_db), current_user = Depends(security.get_current_user)):
+    # Check permissions
+    utils.has_permission(current_user, "update:users")
+
+    if set(changes.add) & set(changes.remove):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A role can not be both added and removed")
+
+    user = (await db.execute(select(models.User.organization_id, models.User.username).filter(models.User.id == user_id))).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    new_roles = db.query(models.Role).filter(models.Role.id.in_(role_ids)).all()
-    user.roles = new_roles  # Replaces all existing roles
-    db.commit()
-    return {"message": "Roles updated successfully"}
+    removed = await remove_associations(db, models.user_roles, "user_id", user_id, "role_id", target_ids=changes.remove)
+    added = await add_associations(db, models.user_roles, "user_id", user_id, "role_id", models.Role, changes.add)
+    return await commit_role_changes(db, user_id, user, added, removed)
 
 
@@ -1,16 +1,30 @@
-from typing import List
+from typing import Generic, List, TypeVar
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from datetime import datetime, date
 
+T = TypeVar("T")
+
+# === Pagination Schemas ===
+class CursorPage(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: str | None = None
+
+
 # === Token Schemas ===
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: str | None = None
     organization_id: str | None = None
     permissions: List[str] = []
+    permission_mask: int | None = None
+    permission_catalog_version: str | None = None
 
     
 # === Organization Schemas ===
@@ -36,7 +50,7 @@ class UserCreate(UserBase):
     password: str
 
 class UserUpdate(UserBase):
-    pass
+    is_active: bool | None = None # Left unchanged when omitted
 
 class UserPublic(UserBase):
     id: int
@@ -48,6 +62,7 @@ class UserPublic(UserBase):
 
 class CurrentUser(UserPublic):
     permissions: List[str] = []
+    permission_mask: int = Field(default=0, exclude=True)
     is_platform_admin: bool | None = False
 
 
@@ -82,8 +97,11 @@ class RolePublic(RoleBase):
     id: int
     created_at: datetime
     updated_at: datetime
-    users: List[UserPublic] = []
-    permissions: List[PermissionPublic] = []
+    user_count: int = 0
+    permission_count: int = 0
+    # Only present when requested with ?expand=users,permissions (first page of each)
+    users: List[UserPublic] | None = None
+    permissions: List[PermissionPublic] | None = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -92,6 +110,20 @@ class RoleWithAssignment(RoleBase):
     assigned: bool | None = None
 
 
+# === Assignment Schemas ===
+class AssignmentPatch(BaseModel):
+    add: List[int] = []
+    remove: List[int] = []
+
+class AssignmentChanges(BaseModel):
+    message: str
+    added: List[int]
+    removed: List[int]
+
+class RoleMembersBatch(BaseModel):
+    user_ids: List[int] = Field(min_length=1)
+
+
 # === Item Schemas ===
 class ItemBase(BaseModel):
     name: str
@@ -99,7 +131,9 @@ class ItemBase(BaseModel):
     price: float
 
 class ItemCreate(ItemBase):
-    pass
+    # Sizes of the items columns, so over-long values are rejected per request or per bulk row, not by the database
+    name: str = Field(max_length=50)
+    description: str | None = Field(default=None, max_length=100)
 
 class ItemPublic(ItemBase):
     id: int
@@ -110,3 +144,13 @@ class ItemPublic(ItemBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+
+# === Bulk Import Schemas ===
+class BulkRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class BulkImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkRowError] = []
@@ -0,0 +1,26 @@
+from sqlalchemy import and_, func, literal_column
+from sqlalchemy.sql.expression import ColumnElement
+
+# Text search configuration shared by the queries and the GIN expression index on items (see models.Item)
+TEXT_SEARCH_CONFIG = literal_column("'simple'")
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def prefix_match(column, prefix: str) -> ColumnElement[bool]:
+    """Case-insensitive prefix match; served by the pg_trgm GIN index on Postgres."""
+    return column.ilike(f"{escape_like(prefix)}%", escape="\\")
+
+def text_search_vector(column):
+    return func.to_tsvector(TEXT_SEARCH_CONFIG, column)
+
+def full_text_match(dialect_name: str, column, query: str) -> ColumnElement[bool]:
+    """
+    Every word of `query` must appear in `column`.
+
+    Postgres matches whole words through the tsvector GIN index; other databases fall back to a
+    case-insensitive substring LIKE per word, which scans the tenant's rows.
+    """
+    if dialect_name == "postgresql":
+        return text_search_vector(column).op("@@")(func.plainto_tsquery(TEXT_SEARCH_CONFIG, query))
+    return and_(True, *(column.ilike(f"%{escape_like(word)}%", escape="\\") for word in query.split()))
@@ -1,39 +1,197 @@
 from datetime import datetime, timedelta, timezone
-from typing import Annotated, Optional, List
+from dataclasses import dataclass
+from typing import Annotated, Iterable, Optional, List, Protocol
 from src.database import get_db
 from src import schemas, models, utils
+from src.cache import TTLCache
+from src.metrics import record_auth_time
+from src.permissions import permission_catalog, decode_permission_mask, resolve_effective_permission_ids
+from src.tenancy import bind_tenant
 from fastapi import Depends, status, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
+import jwt as pyjwt
 from src.config import settings
+import hashlib
 import os
+import secrets
+import time
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='auth/login')
 
-def authenticate_user(username: str, password: str, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.username == username).first()
+
+class InvalidTokenError(Exception):
+    pass
+
+
+class TokenCodec(Protocol):
+    """Signs and verifies JWTs; decode raises InvalidTokenError for a bad signature, malformed token or expired exp."""
+
+    def encode(self, claims: dict) -> str: ...
+
+    def decode(self, token: str) -> dict: ...
+
+
+class JoseTokenCodec:
+    def __init__(self, secret_key: str, algorithm: str):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+
+    def encode(self, claims: dict) -> str:
+        return jwt.encode(claims, self.secret_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except JWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+class PyJWTTokenCodec:
+    """PyJWT backend: a thinner verify path than python-jose for HMAC tokens."""
+
+    def __init__(self, secret_key: str, algorithm: str):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+
+    def encode(self, claims: dict) -> str:
+        return pyjwt.encode(claims, self.secret_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return pyjwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except pyjwt.PyJWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+TOKEN_CODECS = {"jose": JoseTokenCodec, "pyjwt": PyJWTTokenCodec}
+
+token_codec: TokenCodec = TOKEN_CODECS[settings.JWT_BACKEND](SECRET_KEY, ALGORITHM)
+
+# Verified claims keyed by the token's SHA-256, so repeat requests with the same token skip signature verification
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS)
+
+def decode_token(token: str) -> dict:
+    cache_key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(cache_key)
+    if claims is None:
+        claims = token_codec.decode(token)
+        # Never serve the claims past the token's own expiry
+        expires_in = claims["exp"] - time.time() if "exp" in claims else None
+        token_cache.set(cache_key, claims, ttl=expires_in)
+    return claims
+
+# Authenticated users keyed by (organization_id, username), so steady-state requests skip the DB lookup
+principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+
+class TokenRevocations:
+    """
+    Access tokens neither auth path may trust any more, held in memory per worker process.
+
+    A user or organization revocation rejects every token whose `ver` (issue time in ms) is older than it.
+    Entries are dropped once every token they could match has expired. Revocations are not shared between
+    workers: a change handled by one worker leaves the tokens valid on the others until they expire, so
+    run a single worker (or move this to a shared store) before enabling STATELESS_AUTH.
+    """
+
+    def __init__(self, max_token_age_seconds: float):
+        self.max_token_age_ms = max_token_age_seconds * 1000
+        self._users: dict[int, int] = {}
+        self._organizations: dict[str, int] = {}
+
+    def revoke_users(self, user_ids: Iterable[int]):
+        now = token_version()
+        self._users.update(dict.fromkeys(user_ids, now))
+        self._prune(now)
+
+    def revoke_organization(self, organization_id: str):
+        now = token_version()
+        self._organizations[organization_id] = now
+        self._prune(now)
+
+    def is_revoked(self, user_id: int, organization_id: str | None, version: int) -> bool:
+        return version < self._users.get(user_id, 0) or version < self._organizations.get(organization_id, 0)
+
+    def _prune(self, now: int):
+        oldest = now - self.max_token_age_ms
+        for revocations in (self._users, self._organizations):
+            for key in [key for key, revoked_at in revocations.items() if revoked_at < oldest]:
+                del revocations[key]
+
+    def stats(self):
+        return {"users": len(self._users), "organizations": len(self._organizations)}
+
+
+def token_version() -> int:
+    return time.time_ns() // 1_000_000
+
+token_revocations = TokenRevocations(max_token_age_seconds=int(settings.ACCESS_TOKEN_EXPIRE_MINUTES) * 60)
+
+def check_token_revocation(payload: dict):
+    """Reject a token issued before its user or organization was revoked; tokens without `uid`/`ver` predate revocation."""
+    user_id, version = payload.get("uid"), payload.get("ver")
+    if user_id is None or version is None:
+        return
+    if token_revocations.is_revoked(user_id, payload.get("organization_id"), version):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+def revoke_user_tokens(*user_ids: int):
+    token_revocations.revoke_users(user_ids)
+
+# Drop cached principals, and revoke the access tokens issued to them unless revoke_tokens is False. Only pass
+# False for edits that change nothing a token carries (sub, organization_id, is_active, permissions), so the
+# caller's session survives renames and contact detail changes.
+def invalidate_principal(organization_id: str | None, username: str, user_id: int, revoke_tokens: bool = True):
+    principal_cache.invalidate((organization_id, username))
+    if revoke_tokens:
+        revoke_user_tokens(user_id)
+
+def invalidate_organization_principals(organization_id: str, revoke_tokens: bool = True):
+    principal_cache.invalidate_where(lambda key, user: key[0] == organization_id)
+    if revoke_tokens:
+        token_revocations.revoke_organization(organization_id)
+
+def invalidate_user_principals(*user_ids: int, revoke_tokens: bool = True):
+    if revoke_tokens:
+        revoke_user_tokens(*user_ids)
+    user_ids = set(user_ids)
+    principal_cache.invalidate_where(lambda key, user: user.id in user_ids)
+
+async def authenticate_user(username: str, password: str, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(models.User).filter(models.User.username == username))
     if not user:
         return False
-    if not utils.verify_password(password, user.password):
+    if not await utils.verify_password_async(password, user.password):
         return False
     return user
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-async def get_current_user(token: Annotated[Optional[str], Depends(oauth2_scheme)], db: Session = Depends(get_db)):
+    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=15))
+    return token_codec.encode({**data, "exp": expire})
+
+async def get_current_user(token: Annotated[Optional[str], Depends(oauth2_scheme)], db: AsyncSession = Depends(get_db)):
+    start = time.perf_counter()
+    try:
+        user = await resolve_current_user(token, db)
+        if user is not None:
+            # Scope the request's session to the caller's organization (TENANT_ISOLATION=rls)
+            await bind_tenant(db, user)
+        return user
+    finally:
+        record_auth_time(time.perf_counter() - start)
+
+async def resolve_current_user(token: Optional[str], db: AsyncSession):
     if not token:
         return None # No token provided for Basic Auth
     credentials_exception = HTTPException(
@@ -42,35 +200,158 @@ async def get_current_user(token: Annotated[Optional[str], Depends(oauth2_scheme
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
 
         # Extract username, organization, permissions from JWT
         username = payload.get("sub")
         organization_id: int | None = payload.get("organization_id")
         permissions: List[str] = payload.get("permissions", [])
+        encoded_permission_mask: str | None = payload.get("pm")
 
         if username is None:
             raise credentials_exception
-        token_data = schemas.TokenData(username=username, permissions=permissions, organization_id=organization_id)
+        token_data = schemas.TokenData(
+            username=username,
+            permissions=permissions,
+            organization_id=organization_id,
+            permission_mask=decode_permission_mask(encoded_permission_mask) if encoded_permission_mask is not None else None,
+            permission_catalog_version=payload.get("pv"),
+        )
 
-    except JWTError:
+    except InvalidTokenError:
         raise credentials_exception
     except Exception as e:
         print(f"Basic Auth validation error: {e}") 
         raise credentials_exception from e
+
+    check_token_revocation(payload)
     
-    user = db.query(models.User).join(models.Organization,
-                                      models.User.organization_id == models.Organization.id).filter(
-                                          models.User.organization_id == organization_id,
-                                          models.User.username == token_data.username).first()
+    cache_key = (organization_id, token_data.username)
+    user = principal_cache.get(cache_key)
     if user is None:
-        raise credentials_exception
-    
-    # Attach permissions and organization to user object
-    user.permissions = permissions
-    user.organization_id = organization_id
+        user_query = select(models.User).join(models.Organization,
+                                              models.User.organization_id == models.Organization.id).filter(
+                                                  models.User.organization_id == organization_id,
+                                                  models.User.username == token_data.username)
+        db_user = await db.scalar(user_query)
+        if db_user is None:
+            raise credentials_exception
+        user = schemas.CurrentUser.model_validate(db_user)
+        principal_cache.set(cache_key, user)
     
-    return user
+    await permission_catalog.ensure_loaded(db, token_data.permission_catalog_version)
+    permission_mask = token_data.permission_mask
+    if permission_mask is None:
+        # Legacy token carrying the list of permission names
+        permission_mask = permission_catalog.mask_for(token_data.permissions)
+    elif not permission_catalog.is_current(token_data.permission_catalog_version):
+        # Bits are positions in the catalog the token was issued under, which has changed since: re-resolve them
+        permission_mask = await permission_catalog.mask_for_ids(db, await resolve_effective_permission_ids(db, user.id))
+
+    # Attach permissions and organization from the token to a copy of the cached user
+    return user.model_copy(update={"permissions": permissions, "permission_mask": permission_mask, "organization_id": organization_id})
+
+def hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+async def purge_expired_refresh_tokens(db: AsyncSession, user_id: int | None = None) -> int:
+    """
+    Delete expired refresh tokens, of one user or of everyone; returns how many were deleted.
+
+    Spent and revoked tokens are kept until they expire, so that presenting one again is still recognized as reuse.
+    """
+    purge_query = delete(models.RefreshToken).filter(models.RefreshToken.expires_at <= datetime.now(timezone.utc))
+    if user_id is not None:
+        purge_query = purge_query.filter(models.RefreshToken.user_id == user_id)
+    return (await db.execute(purge_query.execution_options(synchronize_session=False))).rowcount
+
+async def create_refresh_token(db: AsyncSession, user_id: int) -> str:
+    # Issuing is the natural time to drop the user's dead tokens; scripts/purge_refresh_tokens.py covers dormant users
+    await purge_expired_refresh_tokens(db, user_id)
+    refresh_token = secrets.token_urlsafe(32)
+    expires_at = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    await db.execute(insert(models.RefreshToken).values(user_id=user_id, token_hash=hash_refresh_token(refresh_token), expires_at=expires_at))
+    return refresh_token
+
+async def revoke_refresh_tokens(db: AsyncSession, user_id: int):
+    await db.execute(update(models.RefreshToken).filter(
+        models.RefreshToken.user_id == user_id, models.RefreshToken.revoked_at.is_(None)).values(revoked_at=datetime.now(timezone.utc)))
+
+async def rotate_refresh_token(db: AsyncSession, refresh_token: str) -> int | None:
+    """Spend a refresh token (each one works once) and return its user id, or None if it is unknown, spent or expired."""
+    token_hash = hash_refresh_token(refresh_token)
+    now = datetime.now(timezone.utc)
+    rotate_query = update(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == token_hash,
+        models.RefreshToken.revoked_at.is_(None),
+        models.RefreshToken.expires_at > now,
+    ).values(revoked_at=now).returning(models.RefreshToken.user_id)
+    user_id = await db.scalar(rotate_query)
+    if user_id is None:
+        # A spent token presented again has leaked (or raced its own rotation): end every session of its user
+        reused_by = await db.scalar(select(models.RefreshToken.user_id).filter(
+            models.RefreshToken.token_hash == token_hash, models.RefreshToken.revoked_at.is_not(None)))
+        if reused_by is not None:
+            await revoke_refresh_tokens(db, reused_by)
+            await db.commit()
+    return user_id
+
+
+@dataclass(frozen=True, slots=True)
+class TokenPrincipal:
+    """Caller built only from verified token claims; quacks like CurrentUser for the fields handlers read."""
+    id: int
+    username: str
+    organization_id: str | None
+    is_platform_admin: bool
+    permission_mask: int
+    is_active: bool = True
+
+
+def resolve_token_principal(token: str) -> TokenPrincipal | None:
+    """The principal for a token carrying the stateless claims, or None when the full lookup is needed."""
+    try:
+        payload = decode_token(token)
+    except InvalidTokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Tokens issued before the stateless claims existed, or to inactive users, take the full path
+    user_id, token_id, version, encoded_permission_mask = payload.get("uid"), payload.get("jti"), payload.get("ver"), payload.get("pm")
+    if user_id is None or token_id is None or version is None or encoded_permission_mask is None or payload.get("sub") is None:
+        return None
+    # Bits are resolved by name, so the catalog must be loaded and know the token's version
+    if not permission_catalog.is_current(payload.get("pv")):
+        return None
+
+    check_token_revocation(payload)
+    return TokenPrincipal(
+        id=user_id,
+        username=payload["sub"],
+        organization_id=payload.get("organization_id"),
+        is_platform_admin=bool(payload.get("pa")),
+        permission_mask=decode_permission_mask(encoded_permission_mask),
+    )
+
+async def get_token_principal(token: Annotated[Optional[str], Depends(oauth2_scheme)], db: AsyncSession = Depends(get_db)):
+    """
+    Opt-in replacement for get_current_active_user on read endpoints that only need the signed claims.
+
+    Skips the user lookup and trusts the token's permissions until it expires or is revoked. Revocations are
+    per worker (see TokenRevocations), which is why STATELESS_AUTH is off by default; falls back to the full get_current_active_user path when the fast path is disabled or cannot be used.
+    """
+    start = time.perf_counter()
+    try:
+        principal = resolve_token_principal(token) if settings.STATELESS_AUTH and token else None
+        if principal is None:
+            principal = await get_current_active_user(await resolve_current_user(token, db))
+        await bind_tenant(db, principal)
+        return principal
+    finally:
+        record_auth_time(time.perf_counter() - start)
 
 async def get_current_active_user(current_user: schemas.UserPublic = Depends(get_current_user)):
     if current_user is None:
@@ -0,0 +1,87 @@
+from sqlalchemy import event, func, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ColumnElement
+from src.config import settings
+
+# Tenant isolation. In "filter" mode every tenant-scoped query carries an explicit organization_id clause.
+# In "rls" mode (Postgres only) a session bound to an organization runs each transaction as TENANT_ROLE with
+# TENANT_SETTING set, and the tenant_isolation policies on TENANT_TABLES hide every other organization's rows.
+# Unbound sessions (login, platform admins, scripts) keep the connecting role: the tables' owner, which the
+# policies do not apply to.
+TENANT_ROLE = "app_tenant"
+TENANT_SETTING = "app.current_org"
+TENANT_TABLES = ("items", "users")
+TENANT_POLICY = "tenant_isolation"
+
+# Installs the role and policies; run by Base.metadata.create_all on Postgres (see models.py) and by the migration
+RLS_DDL = [
+    f"DO $$ BEGIN IF NOT EXISTS (SELECT FROM pg_roles WHERE rolname = '{TENANT_ROLE}') THEN CREATE ROLE {TENANT_ROLE} NOLOGIN; END IF; END $$",
+    f"GRANT {TENANT_ROLE} TO CURRENT_USER",
+    f"GRANT USAGE ON SCHEMA public TO {TENANT_ROLE}",
+    f"GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA public TO {TENANT_ROLE}",
+    f"GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO {TENANT_ROLE}",
+    f"ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT SELECT, INSERT, UPDATE, DELETE ON TABLES TO {TENANT_ROLE}",
+    f"ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT USAGE, SELECT ON SEQUENCES TO {TENANT_ROLE}",
+    *(statement for table in TENANT_TABLES for statement in (
+        f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY",
+        f"DROP POLICY IF EXISTS {TENANT_POLICY} ON {table}",
+        f"CREATE POLICY {TENANT_POLICY} ON {table} TO {TENANT_ROLE} "
+        f"USING (organization_id = current_setting('{TENANT_SETTING}')) "
+        f"WITH CHECK (organization_id = current_setting('{TENANT_SETTING}'))",
+    )),
+]
+
+def rls_enabled() -> bool:
+    return settings.TENANT_ISOLATION == "rls"
+
+def tenant_filter(column, current_user) -> ColumnElement[bool]:
+    """Organization clause of a tenant-scoped query; left to the RLS policies in rls mode."""
+    if current_user.is_platform_admin or rls_enabled():
+        return True
+    return column == current_user.organization_id
+
+def _apply_tenant(connection: Connection, organization_id: str):
+    # Both are transaction-local, so nothing leaks to the next user of the pooled connection
+    connection.exec_driver_sql(f"SET LOCAL ROLE {TENANT_ROLE}")
+    connection.execute(select(func.set_config(TENANT_SETTING, organization_id, True)))
+
+class TenantSession(Session):
+    """Session that re-applies its bound organization at the start of every transaction."""
+
+def apply_session_tenant(session: Session, transaction, connection: Connection):
+    organization_id = session.info.get("tenant")
+    if organization_id is not None:
+        _apply_tenant(connection, organization_id)
+
+event.listen(TenantSession, "after_begin", apply_session_tenant)
+
+async def bind_tenant(db: AsyncSession, current_user):
+    """Scope `db` to the caller's organization for the rest of its life; a no-op in filter mode and for platform admins."""
+    if not rls_enabled() or current_user.is_platform_admin:
+        return
+    organization_id = current_user.organization_id or "" # Users without an organization see no tenant rows
+    if db.info.get("tenant") == organization_id:
+        return
+    db.info["tenant"] = organization_id
+    if db.in_transaction():
+        connection = await db.connection()
+        await connection.run_sync(_apply_tenant, organization_id)
+
+async def verify_rls(engine: AsyncEngine):
+    """Refuse to run in rls mode without the policies in place, since the routers then drop their tenant filters."""
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("TENANT_ISOLATION=rls requires PostgreSQL")
+    async with engine.connect() as connection:
+        is_member = await connection.scalar(
+            text("SELECT pg_has_role(current_user, oid, 'MEMBER') FROM pg_roles WHERE rolname = :role"), {"role": TENANT_ROLE})
+        protected_tables = set(await connection.scalars(
+            text("SELECT pg_class.relname FROM pg_class JOIN pg_policies ON pg_policies.tablename = pg_class.relname "
+                 "WHERE pg_class.relrowsecurity AND pg_policies.policyname = :policy AND pg_class.relname = ANY(:tables)"),
+            {"policy": TENANT_POLICY, "tables": list(TENANT_TABLES)}))
+    if not is_member:
+        raise RuntimeError(f"TENANT_ISOLATION=rls requires the {TENANT_ROLE} role granted to the database user (alembic upgrade head)")
+    missing = set(TENANT_TABLES) - protected_tables
+    if missing:
+        raise RuntimeError(f"TENANT_ISOLATION=rls requires the {TENANT_POLICY} policy on: {', '.join(sorted(missing))} (alembic upgrade head)")
@@ -1,6 +1,10 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+from src.config import settings
 from src.schemas import CurrentUser
+from src.permissions import permission_catalog
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -10,13 +14,79 @@ def verify_password(plain_password, hashed_password):
 def hash_password(password: str):
     return pwd_context.hash(password)
 
-from fastapi import HTTPException, status
-from src.schemas import CurrentUser
+
+class PasswordHashingPool:
+    """
+    Runs bcrypt hashing/verification on a worker pool so it never blocks the event loop.
+
+    At most `max_concurrency` jobs are handed to the pool at once; further callers wait on a semaphore,
+    and `queued` reports how many are waiting.
+    """
+
+    def __init__(self, executor_type: str, max_workers: int, max_concurrency: int):
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self.queued = 0
+        self.running = 0
+        self._executor: Executor | None = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hashing")
+        return self._executor
+
+    async def run(self, func, *args):
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        return {
+            "executor": self.executor_type,
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "queued": self.queued,
+        }
+
+
+password_pool = PasswordHashingPool(
+    executor_type=settings.PASSWORD_HASHING_EXECUTOR,
+    max_workers=settings.PASSWORD_HASHING_WORKERS,
+    max_concurrency=settings.PASSWORD_HASHING_MAX_CONCURRENCY,
+)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+async def hash_password_async(password: str):
+    return await password_pool.run(hash_password, password)
+
 
 def has_permission(current_user: CurrentUser, required_permission: str):
-    if required_permission not in current_user.permissions:
+    bit = permission_catalog.bit_for(required_permission)
+    if bit is None or not (current_user.permission_mask >> bit) & 1:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Insufficient permissions: '{required_permission}' permission required"
         )
-    return True
\ No newline at end of file
+    return True